@@ -1,13 +1,24 @@
 # Splitesheet by Halved :3
+import os
 import sys
+import time
+STARTED = time.perf_counter()
+
+if __name__ == '__main__' and sys.argv[1:2] == ['export']:
+    # headless slicing: `Splitesheet.py export ...` takes the splitecore arguments
+    # and returns before anything below, so it never pays for the Qt imports
+    from splitecore import main as exportmain
+    sys.exit(exportmain(sys.argv[2:]))
+
+import json
+import threading
 import math
-import zipfile
-import io
+from collections import OrderedDict
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
 from PIL import Image
-from PySide6.QtCore import Qt, QRectF, QPointF, QRect, QTimer, QSize
+from PySide6.QtCore import Qt, QRectF, QPointF, QRect, QTimer, QSize, QLineF, QThread, Signal, QFileSystemWatcher
 from PySide6.QtGui import (
     QPixmap,
     QImage,
@@ -18,24 +29,30 @@ from PySide6.QtGui import (
     QFont,
     QIcon,
     QKeySequence,
-    QFontDatabase,
+    QUndoStack,
+    QUndoCommand,
+    QUndoGroup,
+    QPixmapCache,
 )
 from PySide6.QtWidgets import (
     QApplication,
     QFileDialog,
     QGraphicsView,
     QGraphicsScene,
-    QGraphicsPixmapItem,
     QGraphicsRectItem,
     QGraphicsItem,
     QGraphicsSimpleTextItem,
     QMainWindow,
     QWidget,
     QVBoxLayout,
+    QTabBar,
     QPushButton,
     QLabel,
     QSpinBox,
     QLineEdit,
+    QCheckBox,
+    QComboBox,
+    QProgressBar,
     QColorDialog,
     QListWidget,
     QListView,
@@ -48,6 +65,10 @@ from PySide6.QtWidgets import (
     QSizePolicy,
 )
 
+from splitecore import (parsebg, removebg, cliprect, exportzip, exportatlas, humanbytes, PROFILES,
+                        Timings, ExportCancelled, findsprites, foreground, infergrid, loadmanifest,
+                        saveproject, ExportCache, LRUCache, PixelCache, loadsheet)
+
 
 # Styling & etc
 
@@ -80,13 +101,17 @@ QPushButton#exportButton { background: qlineargradient(x1:0,y1:0,x2:0,y2:1, stop
 QPushButton#exportButton:hover { background: #33559b; }
 
 /* Inputs */
-QLineEdit, QSpinBox { background: #0c0e11; border: 1px solid rgba(255,255,255,0.04); padding: 6px; border-radius: 8px; min-height: 26px; }
+QLineEdit, QSpinBox, QComboBox { background: #0c0e11; border: 1px solid rgba(255,255,255,0.04); padding: 6px; border-radius: 8px; min-height: 26px; }
 
 /* Zone list */
 QListWidget { background: transparent; border: none; }
 QListWidget::item { border-radius: 8px; padding: 6px; margin: 3px; }
 QListWidget::item:selected { background: rgba(255,255,255,0.03); outline: 1px solid rgba(255,255,255,0.04); }
 
+/* Sheet tabs */
+QTabBar::tab { background: #14171c; color: #b8c4d4; padding: 6px 12px; border-top-left-radius: 6px; border-top-right-radius: 6px; margin-right: 2px; }
+QTabBar::tab:selected { background: #1f3566; color: #ffffff; }
+
 /* Status */
 QLabel#statusLabel { color: #9fb8d9; font-size: 9pt; }
 
@@ -118,10 +143,34 @@ def makecolor(n: int):
     return palette
 
 
-def piltoqimg(img: Image.Image) -> QImage:
-    img = img.convert("RGBA")
-    data = img.tobytes("raw", "RGBA")
-    qimg = QImage(data, img.width, img.height, QImage.Format.Format_RGBA8888)
+# QPixmap.fromImage uploads ARGB32_Premultiplied without converting it. In memory
+# that is B, G, R, A on little-endian hosts, which Pillow packs straight from RGBA;
+# big-endian hosts keep the byte-ordered RGBA8888 format instead.
+if sys.byteorder == 'little':
+    QIMAGE_FORMAT, QIMAGE_RAWMODE = QImage.Format.Format_ARGB32_Premultiplied, "BGRa"
+else:
+    QIMAGE_FORMAT, QIMAGE_RAWMODE = QImage.Format.Format_RGBA8888_Premultiplied, "RGBa"
+
+
+def piltoqimg(img: Image.Image, strip_rows: int = 256) -> QImage:
+    # The QImage owns the only full-size buffer: Pillow packs a strip of rows at a
+    # time as premultiplied pixels in Qt's native order and it is copied straight
+    # into the image bits, so there is no temporary whole-image bytes object and
+    # no conversion when the image becomes a pixmap.
+    qimg = QImage(img.width, img.height, QIMAGE_FORMAT)
+    if qimg.isNull():
+        return qimg
+    bits = qimg.bits()
+    stride = qimg.bytesPerLine()
+    for y in range(0, img.height, strip_rows):
+        strip = img.crop((0, y, img.width, min(img.height, y + strip_rows)))
+        if strip.mode != "RGBA":
+            strip = strip.convert("RGBA")
+        if QIMAGE_RAWMODE == "RGBa":
+            # Pillow has no RGBA -> RGBa packer, premultiply by converting first
+            strip = strip.convert("RGBa")
+        data = strip.tobytes("raw", QIMAGE_RAWMODE)
+        bits[y * stride:y * stride + len(data)] = data
     return qimg
 
 
@@ -129,7 +178,94 @@ def lumcolor(c: QColor) -> float:
     return 0.299 * c.red() + 0.587 * c.green() + 0.114 * c.blue()
 
 
+class TiledImageItem(QGraphicsItem):
+    # Draws the sheet as tiles cut from a pyramid of 2x downscaled copies, picking
+    # the level that matches the view scale. Levels are built on first use and
+    # tiles are converted to pixmaps lazily, with the least recently drawn dropped.
+    tile_size = 512
+    max_tiles = 128
+
+    def __init__(self, img: Image.Image):
+        super().__init__()
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        self.levels: List[Image.Image] = []
+        self.tiles: OrderedDict = OrderedDict()
+        self.size = (0, 0)
+        self.set_image(img)
+
+    def set_image(self, img: Image.Image):
+        if (img.width, img.height) != self.size:
+            self.prepareGeometryChange()
+        self.size = (img.width, img.height)
+        self.levels = [img]
+        self.tiles.clear()
+        self.update()
+
+    def unload(self):
+        # drop pixels, pyramid and tiles but keep the geometry; set_image brings them back
+        self.levels = []
+        self.tiles.clear()
+
+    def boundingRect(self) -> QRectF:
+        return QRectF(0, 0, self.size[0], self.size[1])
+
+    def max_level(self) -> int:
+        n = 0
+        while max(self.size) > self.tile_size << n:
+            n += 1
+        return n
+
+    def level(self, n: int) -> Image.Image:
+        while len(self.levels) <= n:
+            self.levels.append(self.levels[-1].reduce(2))
+        return self.levels[n]
+
+    def tile(self, n: int, tx: int, ty: int) -> QPixmap:
+        key = (n, tx, ty)
+        pix = self.tiles.get(key)
+        if pix is not None:
+            self.tiles.move_to_end(key)
+            return pix
+        img = self.level(n)
+        ts = self.tile_size
+        crop = img.crop((tx * ts, ty * ts, min(img.width, (tx + 1) * ts), min(img.height, (ty + 1) * ts)))
+        pix = QPixmap.fromImage(piltoqimg(crop))
+        self.tiles[key] = pix
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return pix
+
+    def paint(self, painter: QPainter, option, widget=None):
+        bounds = self.boundingRect()
+        exposed = option.exposedRect.intersected(bounds)
+        if exposed.isEmpty() or not self.levels:
+            return
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        n = 0
+        top = self.max_level()
+        while n < top and lod * (2 << n) <= 1:
+            n += 1
+        scale = 1 << n
+        span = self.tile_size * scale
+        tx0 = int(exposed.left() // span)
+        tx1 = int(math.ceil(exposed.right() / span))
+        ty0 = int(exposed.top() // span)
+        ty1 = int(math.ceil(exposed.bottom() / span))
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                pix = self.tile(n, tx, ty)
+                x, y = tx * span, ty * span
+                w = min(pix.width() * scale, bounds.width() - x)
+                h = min(pix.height() * scale, bounds.height() - y)
+                painter.drawPixmap(QRectF(x, y, w, h), pix, QRectF(pix.rect()))
+
+
 class GridItem(QGraphicsItem):
+    # lines closer than this on screen are merged into a coarser grid
+    min_screen_spacing = 6
+    max_coarsen = 16
+
     def __init__(self, width, height, spacing: int = 1, color: QColor = QColor(255, 255, 255, 18)):
         super().__init__()
         self._w = width
@@ -137,30 +273,46 @@ class GridItem(QGraphicsItem):
         self.spacing = spacing
         self.color = color
         self.setZValue(-500)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
 
     def boundingRect(self) -> QRectF:
         return QRectF(0, 0, self._w, self._h)
 
+    def visible_step(self, scale: float) -> int:
+        step = self.spacing
+        while step * scale < self.min_screen_spacing:
+            step *= 2
+            if step > self.spacing * self.max_coarsen:
+                return 0
+        return step
+
     def paint(self, painter: QPainter, option, widget=None):
         if self.spacing <= 0:
             return
+        step = self.visible_step(option.levelOfDetailFromTransform(painter.worldTransform()))
+        if step <= 0:
+            return
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        left, right = exposed.left(), exposed.right()
+        top, bottom = exposed.top(), exposed.bottom()
+        x0 = int(math.floor(left / step)) * step
+        y0 = int(math.floor(top / step)) * step
+        x1 = min(self._w, int(math.ceil(right)))
+        y1 = min(self._h, int(math.ceil(bottom)))
+        lines = [QLineF(x, top, x, bottom) for x in range(x0, x1 + 1, step)]
+        lines += [QLineF(left, y, right, y) for y in range(y0, y1 + 1, step)]
         pen = QPen(self.color)
         pen.setWidth(0)
         painter.setPen(pen)
-        step = self.spacing
-        x = 0
-        while x <= self._w:
-            painter.drawLine(x, 0, x, self._h)
-            x += step
-        y = 0
-        while y <= self._h:
-            painter.drawLine(0, y, self._w, y)
-            y += step
+        painter.drawLines(lines)
 
     def set_size(self, w: int, h: int):
+        self.prepareGeometryChange()
         self._w = w
         self._h = h
-        self.prepareGeometryChange()
 
 class FrameItem(QGraphicsRectItem):
     def __init__(self, zone: 'ZoneItem', frame_index: int, x: int, y: int, w: int, h: int):
@@ -175,8 +327,7 @@ class FrameItem(QGraphicsRectItem):
         self.zone = zone
         self.frame_index = frame_index
 
-        fill_color = QColor(zone.color.red(), zone.color.green(), zone.color.blue(), 110)
-        self.setBrush(QBrush(fill_color))
+        self.setBrush(ZoneItem.tint(zone.color, 110))
         self.setPen(QPen(Qt.NoPen))
 
         self.handle_size = 4
@@ -186,6 +337,7 @@ class FrameItem(QGraphicsRectItem):
         self.handle.setPen(QPen(Qt.NoPen))
         self.handle.setVisible(False)
         self.resizing = False
+        self.drag_start = []
 
         font = QFont('Courier New', 10)
         font.setBold(True)
@@ -208,6 +360,7 @@ class FrameItem(QGraphicsRectItem):
     def hoverLeaveEvent(self, event):
         if not self.isSelected():
             self.handle.setVisible(False)
+            self.zone.schedule_release(self.frame_index)
         super().hoverLeaveEvent(event)
 
     def mousePressEvent(self, event):
@@ -222,6 +375,7 @@ class FrameItem(QGraphicsRectItem):
             event.accept()
             return
         super().mousePressEvent(event)
+        self.drag_start = [(f, f.pos()) for f in self.scene().selectedItems() if isinstance(f, FrameItem)]
 
     def mouseMoveEvent(self, event):
         if self.resizing:
@@ -238,27 +392,60 @@ class FrameItem(QGraphicsRectItem):
             self.resizing = False
             new_w = int(self.rect().width())
             new_h = int(self.rect().height())
-            self.zone.update_frame_size(new_w, new_h)
+            old_w = int(self.origRect.width())
+            old_h = int(self.origRect.height())
+            if (new_w, new_h) != (old_w, old_h):
+                self.zone.push(ZoneEditCommand(self.zone, {'frame_w': old_w, 'frame_h': old_h},
+                                               {'frame_w': new_w, 'frame_h': new_h}, "Resize frames"))
             event.accept()
             return
         super().mouseReleaseEvent(event)
+        moves = []
+        for f, start in self.drag_start:
+            end = f.pos()
+            if end != start:
+                moves.append((f.zone, f.frame_index, (int(start.x()), int(start.y())), (int(end.x()), int(end.y()))))
+        self.drag_start = []
+        if moves:
+            self.zone.push(FrameMoveCommand(moves))
 
     def itemChange(self, change, value):
         if change == QGraphicsItem.ItemPositionChange and isinstance(value, QPointF):
             new_pos = value
             snapped = QPointF(round(new_pos.x()), round(new_pos.y()))
             return snapped
+        if change == QGraphicsItem.ItemPositionHasChanged:
+            self.zone.frame_moved(self.frame_index, int(self.pos().x()), int(self.pos().y()))
+        elif change == QGraphicsItem.ItemSelectedHasChanged and not value:
+            self.handle.setVisible(False)
+            self.zone.schedule_release(self.frame_index)
         return super().itemChange(change, value)
 
 
 class ZoneItem(QGraphicsRectItem):
+    # Frames are not scene items: the zone paints them from its grid plus a dict of
+    # moved positions, and only turns a frame into a real FrameItem while it is
+    # hovered, selected or dragged. The origin marker is painted by the zone too,
+    # so a zone is a single scene item and detecting thousands of sprites stays cheap.
+    label_min_screen_size = 14
+    label_font: Optional[QFont] = None
+    no_pen = QPen(Qt.NoPen)
+    tints: Dict[tuple, QBrush] = {}
+
     def __init__(self, scene: QGraphicsScene, name: str, x: int, y: int, frame_w: int, frame_h: int,
                  rows: int, cols: int, pad_x: int, pad_y: int, color: QColor):
         super().__init__(x, y, cols * frame_w + (cols - 1) * pad_x, rows * frame_h + (rows - 1) * pad_y)
+        self.moved: Dict[int, tuple] = {}
+        self.live: Dict[int, FrameItem] = {}
+        self._moved_bounds = QRectF()
         self.scene = scene
         self.name = name
-        self.setBrush(QBrush(QColor(color.red(), color.green(), color.blue(), 30)))
-        self.setPen(QPen(Qt.NoPen))
+        self.setBrush(self.tint(color, 30))
+        self.setPen(self.no_pen)
+        self.setAcceptHoverEvents(True)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        if rows * cols > 1:
+            self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
 
         self.rows = rows
         self.cols = cols
@@ -266,50 +453,322 @@ class ZoneItem(QGraphicsRectItem):
         self.pad_y = pad_y
         self.frame_w = frame_w
         self.frame_h = frame_h
-        self.frames: List[FrameItem] = []
         self.color = color
 
-        self.origin_marker = QGraphicsRectItem(0, 0, 3, 3)
-        self.origin_marker.setBrush(QBrush(QColor(color.red(), color.green(), color.blue(), 180)))
-        self.origin_marker.setPen(QPen(Qt.NoPen))
-        self.origin_marker.setZValue(10)
-        self.origin_marker.setVisible(False)
-        scene.addItem(self.origin_marker)
-
         self.on_frame_size_changed = None
+        self.on_changed = None
+        self.undo_stack: Optional[QUndoStack] = None
+        self.timings: Optional[Timings] = None
+
+    @classmethod
+    def tint(cls, color: QColor, alpha: int) -> QBrush:
+        # zones share one brush per colour and opacity instead of building their own
+        key = (color.rgb(), alpha)
+        brush = cls.tints.get(key)
+        if brush is None:
+            brush = cls.tints[key] = QBrush(QColor(color.red(), color.green(), color.blue(), alpha))
+        return brush
+
+    @property
+    def frame_count(self) -> int:
+        return self.rows * self.cols
+
+    def grid_pos(self, idx: int) -> tuple:
+        r, c = divmod(idx, self.cols)
+        return (int(self.rect().x()) + c * (self.frame_w + self.pad_x),
+                int(self.rect().y()) + r * (self.frame_h + self.pad_y))
+
+    def frame_pos(self, idx: int) -> tuple:
+        pos = self.moved.get(idx)
+        return pos if pos is not None else self.grid_pos(idx)
+
+    def frame_at(self, pt: QPointF) -> int:
+        px, py = pt.x(), pt.y()
+        fw, fh = self.frame_w, self.frame_h
+        if fw <= 0 or fh <= 0:
+            return -1
+        for idx in reversed(list(self.moved)):
+            x, y = self.moved[idx]
+            if x <= px < x + fw and y <= py < y + fh:
+                return idx
+        r = self.rect()
+        c, cx = divmod(int(math.floor(px - r.x())), fw + self.pad_x)
+        row, cy = divmod(int(math.floor(py - r.y())), fh + self.pad_y)
+        if 0 <= c < self.cols and 0 <= row < self.rows and cx < fw and cy < fh:
+            idx = row * self.cols + c
+            if idx not in self.moved:
+                return idx
+        return -1
+
+    def visible_frames(self, area: QRectF) -> List[int]:
+        r = self.rect()
+        fw, fh = self.frame_w, self.frame_h
+        if fw <= 0 or fh <= 0:
+            return []
+        step_x, step_y = fw + self.pad_x, fh + self.pad_y
+        c0 = max(0, int((area.left() - r.x() - fw) // step_x) + 1)
+        c1 = min(self.cols - 1, int((area.right() - r.x()) // step_x))
+        r0 = max(0, int((area.top() - r.y() - fh) // step_y) + 1)
+        r1 = min(self.rows - 1, int((area.bottom() - r.y()) // step_y))
+        out = [row * self.cols + c for row in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+        if self.moved:
+            out = [i for i in out if i not in self.moved]
+            out += [i for i, (x, y) in self.moved.items()
+                    if x < area.right() and x + fw > area.left() and y < area.bottom() and y + fh > area.top()]
+        return out
+
+    def frame_rects(self) -> List[tuple]:
+        fw, fh = self.frame_w, self.frame_h
+        return [(i,) + self.frame_pos(i) + (fw, fh) for i in range(self.frame_count)]
+
+    def frame_offsets(self) -> List[tuple]:
+        r = self.rect()
+        ox, oy = int(r.x()), int(r.y())
+        return [(x - ox, y - oy) for _, x, y, _, _ in self.frame_rects()]
 
-        self.generate_frames()
+    def set_frame_offsets(self, offsets: List[tuple]):
+        self.prepareGeometryChange()
+        r = self.rect()
+        ox, oy = int(r.x()), int(r.y())
+        self.moved = {}
+        for i, (offx, offy) in enumerate(offsets[:self.frame_count]):
+            pos = (ox + int(offx), oy + int(offy))
+            if pos != self.grid_pos(i):
+                self.moved[i] = pos
+        self.update_moved_bounds()
+
+    def set_moved_offsets(self, moved: List[list]):
+        self.prepareGeometryChange()
+        r = self.rect()
+        ox, oy = int(r.x()), int(r.y())
+        self.moved = {int(i): (ox + int(offx), oy + int(offy)) for i, offx, offy in moved
+                      if 0 <= int(i) < self.frame_count}
+        self.update_moved_bounds()
 
-    def generate_frames(self):
-        for f in list(self.frames):
-            self.scene.removeItem(f)
-        self.frames = []
-        idx = 0
-        base_x = int(self.rect().x())
-        base_y = int(self.rect().y())
-        for r in range(self.rows):
-            for c in range(self.cols):
-                fx = base_x + c * (self.frame_w + self.pad_x)
-                fy = base_y + r * (self.frame_h + self.pad_y)
-                f = FrameItem(self, idx, fx, fy, self.frame_w, self.frame_h)
-                self.scene.addItem(f)
-                self.frames.append(f)
-                idx += 1
-        self.update_origin_marker()
+    def spec(self) -> Dict[str, Any]:
+        r = self.rect()
+        ox, oy = int(r.x()), int(r.y())
+        data = {
+            'name': self.name,
+            'origin': [ox, oy],
+            'frame_w': self.frame_w,
+            'frame_h': self.frame_h,
+            'rows': self.rows,
+            'cols': self.cols,
+            'pad_x': self.pad_x,
+            'pad_y': self.pad_y,
+            'color': self.color.name(QColor.HexArgb),
+        }
+        if self.moved:
+            data['moved'] = [[i, x - ox, y - oy] for i, (x, y) in sorted(self.moved.items())]
+        return data
+
+    @classmethod
+    def from_spec(cls, scene: QGraphicsScene, data: Dict[str, Any], color: QColor) -> 'ZoneItem':
+        ox, oy = data.get('origin', (0, 0))
+        z = cls(scene, str(data['name']), int(ox), int(oy), int(data['frame_w']), int(data['frame_h']),
+                int(data.get('rows', 1)), int(data.get('cols', 1)),
+                int(data.get('pad_x', 0)), int(data.get('pad_y', 0)),
+                QColor(data['color']) if data.get('color') else color)
+        if data.get('frames_offsets'):
+            z.set_frame_offsets(data['frames_offsets'])
+        if data.get('moved'):
+            z.set_moved_offsets(data['moved'])
+        return z
 
-    def update_frame_size(self, new_w: int, new_h: int):
-        self.frame_w = new_w
-        self.frame_h = new_h
+    def boundingRect(self) -> QRectF:
+        return self.rect().united(self._moved_bounds) if self.moved else self.rect()
+
+    def contains(self, pt: QPointF) -> bool:
+        return self.rect().contains(pt) or self.frame_at(pt) >= 0
+
+    def update_moved_bounds(self):
+        b = QRectF()
+        for x, y in self.moved.values():
+            b = b.united(QRectF(x, y, self.frame_w, self.frame_h))
+        self._moved_bounds = b
+        self.update()
+
+    def paint(self, painter: QPainter, option, widget=None):
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.brush())
+        painter.drawRect(self.rect())
+        self.paint_frames(painter, option)
+        r = self.rect()
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.tint(self.color, 200))
+        painter.drawRect(QRectF(int(r.x()), int(r.y()), 3, 3))
+
+    def paint_frames(self, painter: QPainter, option):
+        fw, fh = self.frame_w, self.frame_h
+        frame_brush = self.tint(self.color, 110)
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if min(fw, fh) * lod < 2:
+            # frames smaller than a couple of pixels on screen are indistinguishable anyway
+            painter.setBrush(frame_brush)
+            painter.drawRect(self.rect())
+            return
+        frames = [i for i in self.visible_frames(option.exposedRect) if i not in self.live]
+        if not frames:
+            return
+        painter.setBrush(frame_brush)
+        rects = []
+        for i in frames:
+            x, y = self.frame_pos(i)
+            rects.append(QRectF(x, y, fw, fh))
+        painter.drawRects(rects)
+
+        if min(fw, fh) * lod < self.label_min_screen_size:
+            return
+        # labels keep a constant screen size like the old ItemIgnoresTransformations text
+        if ZoneItem.label_font is None:
+            ZoneItem.label_font = QFont('Courier New', 10)
+            ZoneItem.label_font.setBold(True)
+        painter.setFont(self.label_font)
+        painter.setPen(QColor(0, 0, 0) if lumcolor(self.color) > 140 else QColor(255, 255, 255))
+        ascent = painter.fontMetrics().ascent()
+        for i, rect in zip(frames, rects):
+            painter.save()
+            painter.translate(rect.x() + 2, rect.y() + 2)
+            painter.scale(1 / lod, 1 / lod)
+            painter.drawText(QPointF(0, ascent), str(i))
+            painter.restore()
+
+    def hoverMoveEvent(self, event):
+        idx = self.frame_at(event.pos())
+        if idx >= 0 and idx not in self.live:
+            self.materialize(idx)
+        super().hoverMoveEvent(event)
+
+    def materialize(self, idx: int) -> 'FrameItem':
+        f = self.live.get(idx)
+        if f is None:
+            x, y = self.frame_pos(idx)
+            f = FrameItem(self, idx, x, y, self.frame_w, self.frame_h)
+            f.setZValue(self.zValue() + 1)
+            self.scene.addItem(f)
+            self.live[idx] = f
+            self.update(QRectF(x, y, self.frame_w, self.frame_h))
+        return f
+
+    def schedule_release(self, idx: int):
+        QTimer.singleShot(0, lambda: self.release(idx))
+
+    def release(self, idx: int, force: bool = False):
+        f = self.live.get(idx)
+        if f is None:
+            return
+        if not force and (f.isSelected() or f.isUnderMouse() or f.resizing
+                          or self.scene.mouseGrabberItem() is f):
+            return
+        del self.live[idx]
+        self.scene.removeItem(f)
+        x, y = self.frame_pos(idx)
+        self.update(QRectF(x, y, self.frame_w, self.frame_h))
+
+    def release_all(self):
+        for idx in list(self.live):
+            self.release(idx, force=True)
+
+    def frame_moved(self, idx: int, x: int, y: int):
+        fw, fh = self.frame_w, self.frame_h
+        old = self.frame_pos(idx)
+        new = QRectF(x, y, fw, fh)
+        if not self.boundingRect().contains(new):
+            self.prepareGeometryChange()
+        if (x, y) == self.grid_pos(idx):
+            self.moved.pop(idx, None)
+        else:
+            self.moved[idx] = (x, y)
+            self._moved_bounds = self._moved_bounds.united(new)
+        self.update(QRectF(old[0], old[1], fw, fh))
+        self.update(new)
+
+    def set_frame_pos(self, idx: int, pos: tuple):
+        f = self.live.get(idx)
+        if f is not None:
+            f.setPos(pos[0], pos[1])
+        else:
+            self.frame_moved(idx, pos[0], pos[1])
+
+    def push(self, cmd: QUndoCommand):
+        if self.undo_stack is not None:
+            self.undo_stack.push(cmd)
+        else:
+            cmd.redo()
+
+    def fields(self) -> Dict[str, Any]:
+        r = self.rect()
+        return {
+            'name': self.name,
+            'origin': (int(r.x()), int(r.y())),
+            'frame_w': self.frame_w,
+            'frame_h': self.frame_h,
+            'rows': self.rows,
+            'cols': self.cols,
+            'pad_x': self.pad_x,
+            'pad_y': self.pad_y,
+            'color': QColor(self.color),
+            'moved': dict(self.moved),
+        }
+
+    def set_fields(self, values: Dict[str, Any]):
+        self.prepareGeometryChange()
+        if 'name' in values:
+            self.name = values['name']
+        if 'color' in values:
+            self.set_color(values['color'])
+        for key in ('frame_w', 'frame_h', 'rows', 'cols', 'pad_x', 'pad_y'):
+            if key in values:
+                setattr(self, key, values[key])
+        if 'origin' in values:
+            r = self.rect()
+            self.setRect(values['origin'][0], values['origin'][1], r.width(), r.height())
+        if 'moved' in values:
+            self.moved = dict(values['moved'])
+        self.relayout()
+        if ('frame_w' in values or 'frame_h' in values) and callable(self.on_frame_size_changed):
+            self.on_frame_size_changed(self.frame_w, self.frame_h, self)
+        if callable(self.on_changed):
+            self.on_changed(self)
+
+    def set_color(self, color: QColor):
+        self.color = QColor(color)
+        self.setBrush(self.tint(color, 30))
+
+    def relayout(self):
+        # rect, live frames and bounds after any change of grid parameters
+        started = time.perf_counter()
+        self.prepareGeometryChange()
+        # single-frame zones paint one rect, a cached pixmap each would only cost memory
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache if self.frame_count > 1 else QGraphicsItem.NoCache)
         w = self.cols * self.frame_w + max(0, (self.cols - 1)) * self.pad_x
         h = self.rows * self.frame_h + max(0, (self.rows - 1)) * self.pad_y
         r = self.rect()
         self.setRect(r.x(), r.y(), w, h)
-        for f in self.frames:
-            f.setRect(0, 0, new_w, new_h)
+        fill = self.tint(self.color, 110)
+        for idx, f in list(self.live.items()):
+            if idx >= self.frame_count:
+                QTimer.singleShot(0, lambda i=idx: self.release(i, force=True))
+                continue
+            f.setRect(0, 0, self.frame_w, self.frame_h)
             f.updateHandle()
-            f.label.setText(str(f.frame_index))
-            f.setBrush(QBrush(QColor(self.color.red(), self.color.green(), self.color.blue(), 110)))
-        self.update_origin_marker()
+            f.setBrush(fill)
+            f.setPos(*self.frame_pos(idx))
+        self.moved = {i: p for i, p in self.moved.items() if i < self.frame_count}
+        self.update_moved_bounds()
+        if self.timings is not None:
+            self.timings.add('zone_rebuild', time.perf_counter() - started)
+
+    def generate_frames(self):
+        self.release_all()
+        self.moved = {}
+        self.relayout()
+
+    def update_frame_size(self, new_w: int, new_h: int):
+        self.frame_w = new_w
+        self.frame_h = new_h
+        self.relayout()
         if callable(self.on_frame_size_changed):
             self.on_frame_size_changed(new_w, new_h, self)
 
@@ -318,24 +777,77 @@ class ZoneItem(QGraphicsRectItem):
         self.setRect(x, y, r.width(), r.height())
         self.generate_frames()
 
-    def update_origin_marker(self):
-        r = self.rect()
-        ox = int(r.x())
-        oy = int(r.y())
-        self.origin_marker.setRect(ox, oy, 3, 3)
-        self.origin_marker.setBrush(QBrush(QColor(self.color.red(), self.color.green(), self.color.blue(), 200)))
-        self.origin_marker.setVisible(True)
-
     def bounding_box(self) -> QRect:
         r = self.rect()
         return QRect(int(r.x()), int(r.y()), int(r.width()), int(r.height()))
 
+class ZoneEditCommand(QUndoCommand):
+    # only the zone fields that changed, before and after
+    def __init__(self, zone: ZoneItem, before: Dict[str, Any], after: Dict[str, Any], text: str = "Edit zone"):
+        super().__init__(text)
+        self.zone = zone
+        self.before = before
+        self.after = after
+
+    def redo(self):
+        self.zone.set_fields(self.after)
+
+    def undo(self):
+        self.zone.set_fields(self.before)
+
+
+class FrameMoveCommand(QUndoCommand):
+    def __init__(self, moves: List[tuple], text: str = "Move frames"):
+        super().__init__(text)
+        self.moves = moves  # (zone, frame index, old pos, new pos)
+
+    def redo(self):
+        for zone, idx, _, new in self.moves:
+            zone.set_frame_pos(idx, new)
+
+    def undo(self):
+        for zone, idx, old, _ in reversed(self.moves):
+            zone.set_frame_pos(idx, old)
+
+
+class ZonesCommand(QUndoCommand):
+    # adding and deleting are the same operation run in opposite directions
+    def __init__(self, window: 'MainWindow', zones: List[ZoneItem], add: bool, text: str):
+        super().__init__(text)
+        self.window = window
+        self.sheet = window.sheet
+        self.zones = zones
+        self.add = add
+        self.indexes: Optional[List[int]] = None
+
+    def focus(self):
+        # zone lists belong to the active sheet, bring ours forward first
+        if self.sheet is not None and self.window.sheet is not self.sheet:
+            self.window.sheet_tabs.setCurrentIndex(self.window.sheets.index(self.sheet))
+
+    def insert(self):
+        self.focus()
+        self.window.register_zones(self.zones, self.indexes)
+
+    def remove(self):
+        self.focus()
+        self.indexes = self.window.unregister_zones(self.zones)
+
+    def redo(self):
+        self.insert() if self.add else self.remove()
+
+    def undo(self):
+        self.remove() if self.add else self.insert()
+
+
 class ImageGraphicsView(QGraphicsView):
     def __init__(self, *args):
         super().__init__(*args)
-        self.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+        # everything on the sheet is pixel aligned, so antialiasing only blurs edges
+        self.setRenderHints(QPainter.TextAntialiasing)
         self.setRenderHint(QPainter.SmoothPixmapTransform, False)
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.DontAdjustForAntialiasing, True)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
         self.setDragMode(QGraphicsView.NoDrag)
 
         self._zoom = 1.0
@@ -359,7 +871,7 @@ class ImageGraphicsView(QGraphicsView):
     def mousePressEvent(self, event):
         pos = event.position().toPoint()
         item = self.itemAt(pos)
-        if event.button() == Qt.LeftButton and (item is None or isinstance(item, QGraphicsPixmapItem)):
+        if event.button() == Qt.LeftButton and (item is None or isinstance(item, TiledImageItem)):
             self._pan = True
             self.setCursor(Qt.ClosedHandCursor)
             self._pan_start = event.position()
@@ -394,25 +906,272 @@ class ImageGraphicsView(QGraphicsView):
         super().keyReleaseEvent(event)
 
 
+class ExportThread(QThread):
+    # Runs exportzip/exportatlas on a snapshot of the zone geometry taken when the
+    # export started, so the canvas can keep being edited meanwhile.
+    progress = Signal(int, int, str)
+    progress_interval = 0.05
+
+    def __init__(self, kind: str, img: Image.Image, sheet: str, zones: list, out_path: Path,
+                 bg_rgb: Optional[tuple], options: Dict[str, Any], parent=None):
+        super().__init__(parent)
+        self.kind = kind
+        self.img = img
+        self.sheet = sheet
+        self.zones = zones
+        self.out_path = out_path
+        self.bg_rgb = bg_rgb
+        self.options = options
+        self.cancel_event = threading.Event()
+        self.timings = Timings()
+        self.count = 0
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self._last_emit = 0.0
+
+    def report(self, done: int, total: int, zone: str):
+        # the encoder calls this for every frame; only pass on a few per second
+        now = time.perf_counter()
+        if done == total or now - self._last_emit >= self.progress_interval:
+            self._last_emit = now
+            self.progress.emit(done, total, zone)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        export = exportzip if self.kind == 'zip' else exportatlas
+        try:
+            self.count = export(self.img, self.sheet, self.zones, self.out_path, self.bg_rgb,
+                                timings=self.timings, progress=self.report, cancel=self.cancel_event,
+                                **self.options)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = str(e)
+        self.timings.finish()
+
+
+class PreviewCanvas(QWidget):
+    # draws the current frame scaled to fit, integer zoom and no smoothing
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pixmap: Optional[QPixmap] = None
+        self.setMinimumSize(160, 160)
+
+    def set_pixmap(self, pix: Optional[QPixmap]):
+        self.pixmap = pix
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(12, 14, 17))
+        pix = self.pixmap
+        if pix is None or pix.isNull():
+            return
+        scale = min(self.width() / pix.width(), self.height() / pix.height())
+        if scale >= 1:
+            scale = int(scale)
+        w, h = pix.width() * scale, pix.height() * scale
+        target = QRectF((self.width() - w) / 2, (self.height() - h) / 2, w, h)
+        painter.drawPixmap(target, pix, QRectF(pix.rect()))
+
+
+class AnimationPreview(QWidget):
+    # Plays the selected zone's frames in frame_index order. Converted pixmaps are
+    # cached by (crop rect, background), so a tick is a dict lookup and a blit;
+    # moving or resizing a frame or changing the background simply misses.
+    cache_budget = 64 * 1024 * 1024
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.img: Optional[Image.Image] = None
+        self.zone: Optional['ZoneItem'] = None
+        self.bg_rgb: Optional[tuple] = None
+        self.index = 0
+        self.cache = LRUCache(self.cache_budget, lambda pix: pix.width() * pix.height() * 4)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        self.canvas = PreviewCanvas()
+        layout.addWidget(self.canvas, 1)
+        row = QWidget(); row_h = QHBoxLayout(); row_h.setContentsMargins(0,0,0,0); row.setLayout(row_h)
+        self.play_btn = QPushButton("Play")
+        self.play_btn.setObjectName("basicButton")
+        self.play_btn.clicked.connect(self.toggle)
+        self.fps = QSpinBox()
+        self.fps.setRange(1, 60)
+        self.fps.setSuffix(" fps")
+        self.fps.valueChanged.connect(self.set_fps)
+        self.frame_label = QLabel("")
+        row_h.addWidget(self.play_btn)
+        row_h.addWidget(self.fps)
+        row_h.addWidget(self.frame_label)
+        layout.addWidget(row)
+        self.fps.setValue(12)
+
+    def set_sheet(self, img: Optional[Image.Image]):
+        self.img = img
+        self.cache.clear()
+        self.show_frame()
+
+    def set_zone(self, zone: Optional['ZoneItem']):
+        if zone is not self.zone:
+            self.zone = zone
+            self.index = 0
+        self.show_frame()
+
+    def set_background(self, rgb: Optional[tuple]):
+        if rgb != self.bg_rgb:
+            self.bg_rgb = rgb
+            self.show_frame()
+
+    def set_fps(self, fps: int):
+        self.timer.setInterval(max(1, round(1000 / fps)))
+
+    def toggle(self):
+        if self.timer.isActive():
+            self.timer.stop()
+            self.play_btn.setText("Play")
+        else:
+            self.timer.start()
+            self.play_btn.setText("Pause")
+
+    def tick(self):
+        if self.zone is None or self.zone.frame_count == 0:
+            return
+        self.index = (self.index + 1) % self.zone.frame_count
+        self.show_frame()
+
+    def frame_pixmap(self, idx: int) -> Optional[QPixmap]:
+        z = self.zone
+        x, y = z.frame_pos(idx)
+        box = cliprect(int(x), int(y), z.frame_w, z.frame_h, self.img.width, self.img.height)
+        if box is None:
+            return None
+        key = (box, self.bg_rgb)
+        pix = self.cache.get(key)
+        if pix is None:
+            crop = self.img.crop(box)
+            if self.bg_rgb is not None:
+                crop = removebg(crop, self.bg_rgb)
+            pix = QPixmap.fromImage(piltoqimg(crop))
+            self.cache.put(key, pix)
+        return pix
+
+    def show_frame(self):
+        if self.img is None or self.zone is None or self.zone.frame_count == 0:
+            self.canvas.set_pixmap(None)
+            self.frame_label.setText("")
+            return
+        self.index %= self.zone.frame_count
+        self.canvas.set_pixmap(self.frame_pixmap(self.index))
+        self.frame_label.setText(f"{self.index} / {self.zone.frame_count}")
+
+    def hideEvent(self, event):
+        if self.timer.isActive():
+            self.toggle()
+        super().hideEvent(event)
+
+
+class Sheet:
+    # One open spritesheet: its scene, zones, undo history and dock fields. The
+    # decoded pixels are not held here but in the window's image cache. Each sheet
+    # keeps its own export cache so re-exports only encode frames that changed; it
+    # is dropped along with the pixels when they are evicted, which bounds it too.
+    def __init__(self, path: Path, scene: QGraphicsScene, undo_stack: QUndoStack):
+        self.path = path
+        self.scene = scene
+        self.undo_stack = undo_stack
+        self.zones: List[ZoneItem] = []
+        self.image_item: Optional[TiledImageItem] = None
+        self.grid_item: Optional[GridItem] = None
+        self.name = path.stem
+        self.background = "#ffffff"
+        self.view_transform = None
+        self.view_center: Optional[QPointF] = None
+        self.export_cache = ExportCache()
+        # (kind, folder) of the last export, repeated by watch mode on save
+        self.export_target: Optional[tuple] = None
+
+
 class MainWindow(QMainWindow):
+    # decoded sheets kept around for quick switching, override with SPLITESHEET_IMAGE_MB
+    image_budget_mb = 1024
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Splitesheet")
         self.resize(1200, 800)
 
         self.scene = QGraphicsScene(self)
+        # room for the cached sheet, grid and zone layers at full viewport size
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), 128 * 1024))
         self.view = ImageGraphicsView(self.scene)
-        self.setCentralWidget(self.view)
+        self.sheet_tabs = QTabBar()
+        self.sheet_tabs.setTabsClosable(True)
+        self.sheet_tabs.setExpanding(False)
+        self.sheet_tabs.setDocumentMode(True)
+        self.sheet_tabs.currentChanged.connect(self.on_sheet_tab)
+        self.sheet_tabs.tabCloseRequested.connect(self.close_sheet)
+        central = QWidget()
+        central_v = QVBoxLayout(); central_v.setContentsMargins(0,0,0,0); central_v.setSpacing(0)
+        central.setLayout(central_v)
+        central_v.addWidget(self.sheet_tabs)
+        central_v.addWidget(self.view, 1)
+        self.setCentralWidget(central)
+
+        self.sheets: List[Sheet] = []
+        self.sheet: Optional[Sheet] = None
+        budget_mb = int(os.environ.get('SPLITESHEET_IMAGE_MB', self.image_budget_mb))
+        self.images = LRUCache(budget_mb * 1024 * 1024, lambda img: img.width * img.height * 4)
+        # SPLITESHEET_PIXEL_CACHE=DIR keeps decoded sheets on disk and maps them on reopen
+        self.pixel_cache: Optional[PixelCache] = None
+        if os.environ.get('SPLITESHEET_PIXEL_CACHE'):
+            try:
+                self.pixel_cache = PixelCache(Path(os.environ['SPLITESHEET_PIXEL_CACHE']))
+            except OSError as e:
+                print(f"Pixel cache disabled: {e}", file=sys.stderr)
 
         self.pil_image: Optional[Image.Image] = None
-        self.qpixmap_item: Optional[QGraphicsPixmapItem] = None
+        self.image_path: Optional[Path] = None
+        self.image_item: Optional[TiledImageItem] = None
         self.grid_item: Optional[GridItem] = None
         self.zones: List[ZoneItem] = []
         self.waiting_for_origin = False
         self.copied_zone: Optional[Dict[str, Any]] = None
+        self.last_export: Optional[Timings] = None
+        self.export_thread: Optional[ExportThread] = None
+        self.export_queue: List[Sheet] = []
+        # watch mode: saves are collected until the files have been quiet for a moment
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_sheet_file_changed)
+        self.changed_paths = set()
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(400)
+        self.reload_timer.timeout.connect(self.reload_changed_sheets)
+        self.zone_icons: Dict[int, QIcon] = {}
+        self.undo_group = QUndoGroup(self)
+        self.undo_stack = QUndoStack(self)
+        self.undo_group.addStack(self.undo_stack)
+        # scene and history shown while no sheet is open
+        self.blank_scene = self.scene
+        self.blank_stack = self.undo_stack
+        self.undo_group.setActiveStack(self.undo_stack)
+        # per-operation timings for the session; SPLITESHEET_TIMINGS=1 logs them to stderr
+        self.timings = Timings()
 
         self.create_dock()
         self.setAcceptDrops(True)
+        undo_act = self.undo_group.createUndoAction(self)
+        undo_act.setShortcut(QKeySequence.Undo)
+        redo_act = self.undo_group.createRedoAction(self)
+        redo_act.setShortcuts([QKeySequence.Redo, QKeySequence("Ctrl+Shift+Z")])
+        self.addAction(undo_act)
+        self.addAction(redo_act)
         self.palette = makecolor(32)
 
     def show_status(self, text: str, timeout_ms: int = 2500):
@@ -432,6 +1191,17 @@ class MainWindow(QMainWindow):
         load_btn.clicked.connect(self.load_image)
         layout.addWidget(load_btn)
 
+        row0 = QWidget(); row0_h = QHBoxLayout(); row0_h.setContentsMargins(0,0,0,0); row0.setLayout(row0_h)
+        open_proj_btn = QPushButton("Open project")
+        open_proj_btn.setObjectName("basicButton")
+        open_proj_btn.clicked.connect(self.load_project)
+        save_proj_btn = QPushButton("Save project")
+        save_proj_btn.setObjectName("basicButton")
+        save_proj_btn.clicked.connect(self.save_project)
+        row0_h.addWidget(open_proj_btn)
+        row0_h.addWidget(save_proj_btn)
+        layout.addWidget(row0)
+
         self.sheet_input = QLineEdit()
         self.sheet_input.setPlaceholderText("Enter name for this spritesheet")
         layout.addWidget(QLabel("Sheet name:"))
@@ -476,6 +1246,11 @@ class MainWindow(QMainWindow):
         row2_h.addWidget(del_zone_btn)
         layout.addWidget(row2)
 
+        detect_btn = QPushButton("Auto-detect sprites")
+        detect_btn.setObjectName("basicButton")
+        detect_btn.clicked.connect(self.detect_sprites)
+        layout.addWidget(detect_btn)
+
         row3 = QWidget(); row3_h = QHBoxLayout(); row3_h.setContentsMargins(0,0,0,0); row3.setLayout(row3_h)
         copy_zone_btn = QPushButton("Copy")
         copy_zone_btn.setObjectName("copyButton")
@@ -487,11 +1262,31 @@ class MainWindow(QMainWindow):
         row3_h.addWidget(paste_zone_btn)
         layout.addWidget(row3)
 
+        row4 = QWidget(); row4_h = QHBoxLayout(); row4_h.setContentsMargins(0,0,0,0); row4.setLayout(row4_h)
+        undo_btn = QPushButton("Undo")
+        undo_btn.setObjectName("basicButton")
+        undo_btn.clicked.connect(self.undo_group.undo)
+        self.undo_group.canUndoChanged.connect(undo_btn.setEnabled)
+        undo_btn.setEnabled(False)
+        redo_btn = QPushButton("Redo")
+        redo_btn.setObjectName("basicButton")
+        redo_btn.clicked.connect(self.undo_group.redo)
+        self.undo_group.canRedoChanged.connect(redo_btn.setEnabled)
+        redo_btn.setEnabled(False)
+        row4_h.addWidget(undo_btn)
+        row4_h.addWidget(redo_btn)
+        layout.addWidget(row4)
+
         pick_origin_btn = QPushButton("Set origin by click")
         pick_origin_btn.setObjectName("basicButton")
         pick_origin_btn.clicked.connect(self.enable_origin_pick)
         layout.addWidget(pick_origin_btn)
 
+        infer_btn = QPushButton("Infer grid from selection")
+        infer_btn.setObjectName("basicButton")
+        infer_btn.clicked.connect(self.enable_grid_infer)
+        layout.addWidget(infer_btn)
+
         layout.addWidget(QLabel("Selected zone properties:"))
         form = QFormLayout()
         self.z_name = QLineEdit()
@@ -524,10 +1319,41 @@ class MainWindow(QMainWindow):
         apply_zone_btn.clicked.connect(self.apply_zone_changes)
         layout.addWidget(apply_zone_btn)
 
-        export_btn = QPushButton("Export frames as .zip")
-        export_btn.setObjectName("exportButton")
-        export_btn.clicked.connect(self.export_zip)
-        layout.addWidget(export_btn)
+        self.dedup_check = QCheckBox("Store duplicate frames once")
+        self.dedup_check.setToolTip("Identical frames are exported once and listed as aliases")
+        layout.addWidget(self.dedup_check)
+        self.trim_check = QCheckBox("Trim transparent borders")
+        self.trim_check.setToolTip("Frames are cropped to their content; offsets and full sizes are saved alongside")
+        layout.addWidget(self.trim_check)
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(list(PROFILES))
+        self.profile_combo.setCurrentText('default')
+        self.profile_combo.setToolTip("fast: quick exports while iterating, small: smallest files for release builds")
+        layout.addWidget(QLabel("Export profile:"))
+        layout.addWidget(self.profile_combo)
+        self.watch_check = QCheckBox("Watch sheets and re-export on save")
+        self.watch_check.setToolTip("Reloads a sheet when its file changes, keeping the zones, and repeats its last export")
+        self.watch_check.toggled.connect(self.set_watching)
+        layout.addWidget(self.watch_check)
+
+        self.export_btn = QPushButton("Export frames as .zip")
+        self.export_btn.setObjectName("exportButton")
+        self.export_btn.clicked.connect(self.export_zip)
+        layout.addWidget(self.export_btn)
+
+        self.atlas_btn = QPushButton("Export packed atlas")
+        self.atlas_btn.setObjectName("basicButton")
+        self.atlas_btn.clicked.connect(self.export_atlas)
+        layout.addWidget(self.atlas_btn)
+
+        self.export_progress = QProgressBar()
+        self.export_progress.setVisible(False)
+        layout.addWidget(self.export_progress)
+        self.cancel_export_btn = QPushButton("Cancel export")
+        self.cancel_export_btn.setObjectName("basicButton")
+        self.cancel_export_btn.clicked.connect(self.cancel_export)
+        self.cancel_export_btn.setVisible(False)
+        layout.addWidget(self.cancel_export_btn)
 
         self.status_label = QLabel("")
         self.status_label.setObjectName("statusLabel")
@@ -538,38 +1364,283 @@ class MainWindow(QMainWindow):
         dock.setWidget(w)
         self.addDockWidget(Qt.RightDockWidgetArea, dock)
 
+        preview_dock = QDockWidget("Preview", self)
+        preview_dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
+        self.preview = AnimationPreview()
+        self.bg_line.textChanged.connect(lambda text: self.preview.set_background(parsebg(text)))
+        self.preview.set_background(parsebg(self.bg_line.text()))
+        preview_dock.setWidget(self.preview)
+        self.addDockWidget(Qt.LeftDockWidgetArea, preview_dock)
+
     def load_image(self):
-        fpath, _ = QFileDialog.getOpenFileName(self, "Open image", "", "Images (*.png *.bmp *.jpg *.gif *.webp)")
-        if not fpath:
+        fpaths, _ = QFileDialog.getOpenFileNames(self, "Open images", "", "Images (*.png *.bmp *.jpg *.gif *.webp)")
+        if not fpaths:
             self.show_status("Load cancelled", 1200)
             return
-        self.open_image(Path(fpath))
-
-    def open_image(self, path: Path):
+        for fpath in fpaths:
+            self.open_image(Path(fpath))
+
+    def open_image(self, path: Path) -> bool:
+        # opens the sheet in its own tab, or switches to it when it is already open
+        path = Path(path)
+        for i, sheet in enumerate(self.sheets):
+            if sheet.path.resolve() == path.resolve():
+                self.sheet_tabs.setCurrentIndex(i)
+                return True
+        started = time.perf_counter()
         try:
-            self.pil_image = Image.open(path).convert("RGBA")
+            with self.timings.stage('open_image.decode'):
+                img = self.decode_sheet(path)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to open image: {e}")
+            return False
+        display = time.perf_counter()
+        stack = QUndoStack(self)
+        self.undo_group.addStack(stack)
+        sheet = Sheet(path, QGraphicsScene(self), stack)
+        sheet.image_item = TiledImageItem(img)
+        sheet.image_item.setZValue(-1000)
+        sheet.scene.addItem(sheet.image_item)
+        sheet.grid_item = GridItem(img.width, img.height, spacing=1)
+        sheet.grid_item.setZValue(-500)
+        sheet.scene.addItem(sheet.grid_item)
+        sheet.scene.setSceneRect(QRectF(0, 0, img.width, img.height))
+        self.sheets.append(sheet)
+        if self.watch_check.isChecked():
+            self.watcher.addPath(str(path))
+        # adding the first tab already makes it current and activates it
+        self.sheet_tabs.addTab(path.name)
+        self.sheet_tabs.setTabToolTip(len(self.sheets) - 1, str(path))
+        self.sheet_tabs.setCurrentIndex(len(self.sheets) - 1)
+        now = time.perf_counter()
+        self.timings.add('open_image.display', now - display)
+        self.timings.add('open_image', now - started)
+        self.log_timings('open_image')
+        self.show_status(f"Loaded {path.name}")
+        return True
+
+    def decode_sheet(self, path: Path) -> Image.Image:
+        img = loadsheet(path, self.pixel_cache)
+        self.images.put(str(path.resolve()), img)
+        for sheet in self.sheets:
+            if sheet.export_cache.mem and str(sheet.path.resolve()) not in self.images:
+                # a running export keeps its own reference, replacing is safe
+                sheet.export_cache = ExportCache()
+        return img
+
+    def sheet_image(self, sheet: Sheet) -> Image.Image:
+        # decoded pixels from the budgeted cache, decoding again if they were evicted
+        img = self.images.get(str(sheet.path.resolve()))
+        if img is None:
+            with self.timings.stage('sheet_redecode'):
+                img = self.decode_sheet(sheet.path)
+        return img
+
+    def on_sheet_tab(self, idx: int):
+        self.activate_sheet(self.sheets[idx] if 0 <= idx < len(self.sheets) else None)
+
+    def activate_sheet(self, sheet: Optional[Sheet]):
+        if sheet is not None and sheet is self.sheet:
             return
-        qimg = piltoqimg(self.pil_image)
-        pix = QPixmap.fromImage(qimg)
-        if self.qpixmap_item:
+        started = time.perf_counter()
+        old = self.sheet
+        if old is not None and old is not sheet:
+            old.name = self.sheet_input.text()
+            old.background = self.bg_line.text()
+            old.view_transform = self.view.transform()
+            old.view_center = self.view.mapToScene(self.view.viewport().rect().center())
+            for z in old.zones:
+                z.release_all()
+            if old.image_item is not None:
+                old.image_item.unload()
+        self.sheet = sheet
+        if sheet is None:
+            self.scene = self.blank_scene
+            self.view.setScene(self.scene)
+            self.zones = []
+            self.pil_image = None
+            self.image_path = None
+            self.image_item = None
+            self.grid_item = None
+            self.undo_stack = self.blank_stack
+        else:
+            self.scene = sheet.scene
+            self.zones = sheet.zones
+            self.image_item = sheet.image_item
+            self.grid_item = sheet.grid_item
+            self.image_path = sheet.path
+            self.undo_stack = sheet.undo_stack
+            self.pil_image = self.sheet_image(sheet)
+            if not self.image_item.levels:
+                self.image_item.set_image(self.pil_image)
+            self.view.setScene(self.scene)
+            if sheet.view_transform is not None:
+                self.view.setTransform(sheet.view_transform)
+                self.view.centerOn(sheet.view_center)
+            else:
+                self.view.resetTransform()
+            self.sheet_input.setText(sheet.name)
+            self.bg_line.setText(sheet.background)
+        self.undo_group.setActiveStack(self.undo_stack)
+        self.fill_zone_list()
+        self.preview.set_sheet(self.pil_image)
+        self.timings.add('switch_sheet', time.perf_counter() - started)
+
+    def fill_zone_list(self):
+        self.zone_list.setUpdatesEnabled(False)
+        self.zone_list.blockSignals(True)
+        try:
+            self.zone_list.clear()
+            for z in self.zones:
+                item = QListWidgetItem(z.name)
+                item.setIcon(self.zone_icon(z.color))
+                item.setSizeHint(QSize(110, 80))
+                self.zone_list.addItem(item)
+        finally:
+            self.zone_list.blockSignals(False)
+            self.zone_list.setUpdatesEnabled(True)
+        if self.zones:
+            self.zone_list.setCurrentRow(0)
+        self.on_zone_selected(self.zone_list.currentRow())
+
+    def close_sheet(self, idx: int):
+        sheet = self.sheets[idx]
+        if sheet is self.sheet:
+            # nothing to stash; removing the tab activates the neighbour (or no sheet)
+            self.sheet = None
+        del self.sheets[idx]
+        self.sheet_tabs.removeTab(idx)
+        for z in sheet.zones:
+            z.release_all()
+        self.undo_group.removeStack(sheet.undo_stack)
+        sheet.undo_stack.deleteLater()
+        sheet.scene.deleteLater()
+        self.images.pop(str(sheet.path.resolve()))
+        self.watcher.removePath(str(sheet.path))
+        if sheet in self.export_queue:
+            self.export_queue.remove(sheet)
+        self.show_status(f"Closed {sheet.path.name}", 1200)
+
+    def set_watching(self, on: bool):
+        files = self.watcher.files()
+        if files:
+            self.watcher.removePaths(files)
+        self.changed_paths.clear()
+        if on and self.sheets:
+            self.watcher.addPaths([str(s.path) for s in self.sheets])
+
+    def on_sheet_file_changed(self, path: str):
+        # every save restarts the timer, so a burst of writes reloads once
+        self.changed_paths.add(path)
+        self.reload_timer.start()
+
+    def reload_changed_sheets(self):
+        paths, self.changed_paths = self.changed_paths, set()
+        for path in paths:
+            sheet = next((s for s in self.sheets if str(s.path) == path), None)
+            if sheet is None:
+                continue
+            # atomic saves replace the file and the watcher loses track of it
+            if path not in self.watcher.files() and not (os.path.exists(path) and self.watcher.addPath(path)):
+                self.show_status(f"{sheet.path.name} was removed, no longer watching it", 3000)
+                continue
             try:
-                self.scene.removeItem(self.qpixmap_item)
-            except Exception:
-                pass
-        self.qpixmap_item = QGraphicsPixmapItem(pix)
-        self.qpixmap_item.setTransformationMode(Qt.FastTransformation)
-        self.scene.addItem(self.qpixmap_item)
-        self.qpixmap_item.setZValue(-1000)
-        if self.grid_item:
-            self.scene.removeItem(self.grid_item)
-        self.grid_item = GridItem(self.pil_image.width, self.pil_image.height, spacing=1)
-        self.scene.addItem(self.grid_item)
-        self.grid_item.setZValue(-500)
-        self.scene.setSceneRect(QRectF(0, 0, self.pil_image.width, self.pil_image.height))
-        self.view.resetTransform()
-        self.show_status(f"Loaded {path.name}")
+                self.reload_sheet(sheet)
+            except Exception as e:
+                # a half written file; the write that completes it fires again
+                self.show_status(f"Failed to reload {sheet.path.name}: {e}", 3000)
+                continue
+            if sheet.export_target is not None and sheet not in self.export_queue:
+                self.export_queue.append(sheet)
+        self.run_export_queue()
+
+    def reload_sheet(self, sheet: Sheet):
+        # new pixels for an open sheet; zones, history and view are left alone
+        with self.timings.stage('reload_sheet'):
+            img = self.decode_sheet(sheet.path)
+        sheet.scene.setSceneRect(QRectF(0, 0, img.width, img.height))
+        sheet.grid_item.set_size(img.width, img.height)
+        if sheet is self.sheet:
+            self.pil_image = img
+            sheet.image_item.set_image(img)
+            self.preview.set_sheet(img)
+        else:
+            # inactive sheets pick up the new pixels from the cache when shown
+            sheet.image_item.unload()
+        self.log_timings('reload_sheet')
+        self.show_status(f"Reloaded {sheet.path.name}", 1600)
+
+    def log_timings(self, op: str, timings: Optional[Timings] = None):
+        if os.environ.get('SPLITESHEET_TIMINGS'):
+            report = (timings or self.timings).report()
+            print(json.dumps(dict({'op': op}, **report)), file=sys.stderr)
+
+    def save_project(self):
+        if not self.pil_image or not self.image_path:
+            self.show_status("Load an image first", 1600)
+            return
+        fpath, _ = QFileDialog.getSaveFileName(self, "Save project", "", "Splitesheet project (*.json)")
+        if not fpath:
+            self.show_status("Save cancelled", 1000)
+            return
+        path = Path(fpath)
+        try:
+            sheet = os.path.relpath(self.image_path, path.parent)
+        except ValueError:
+            sheet = str(self.image_path)
+        data = {
+            'sheet': Path(sheet).as_posix(),
+            'name': self.sheet_input.text().strip(),
+            'background': self.bg_line.text().strip(),
+            'zones': [z.spec() for z in self.zones],
+        }
+        try:
+            saveproject(path, data)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to save project: {e}")
+            return
+        self.show_status(f"Saved {path.name}", 2000)
+
+    def load_project(self):
+        fpath, _ = QFileDialog.getOpenFileName(self, "Open project", "", "Splitesheet project (*.json)")
+        if not fpath:
+            self.show_status("Open cancelled", 1000)
+            return
+        self.open_project(Path(fpath))
+
+    def open_project(self, path: Path):
+        try:
+            data = loadmanifest(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Error", f"Failed to open project: {e}")
+            return
+        if data.get('sheet') and not self.open_image(path.parent / data['sheet']):
+            return
+        # build every zone before touching the open ones, a bad spec leaves them and the undo history alone
+        zones = []
+        try:
+            for i, spec in enumerate(data.get('zones', [])):
+                zones.append(ZoneItem.from_spec(self.scene, spec, self.palette[i % len(self.palette)]))
+        except (KeyError, TypeError, ValueError) as e:
+            QMessageBox.warning(self, "Error", f"Invalid zone in project: {e}")
+            return
+        if data.get('name'):
+            self.sheet_input.setText(data['name'])
+        if data.get('background'):
+            self.bg_line.setText(data['background'])
+        self.clear_zones()
+        with self.timings.stage('open_project.zones'):
+            self.register_zones(zones)
+        self.log_timings('open_project')
+        self.show_status(f"Opened {path.name} ({len(zones)} zones)", 2000)
+
+    def clear_zones(self):
+        self.undo_stack.clear()
+        for z in self.zones:
+            z.release_all()
+            self.scene.removeItem(z)
+        self.zones.clear()
+        self.zone_list.clear()
 
     def dragEnterEvent(self, event):
         event.accept()
@@ -579,8 +1650,13 @@ class MainWindow(QMainWindow):
         if mime.hasUrls():
             url = mime.urls()[0]
             p = Path(url.toLocalFile())
-            if p.exists():
-                self.open_image(p)
+            if p.exists() and p.suffix.lower() == '.json':
+                self.open_project(p)
+            elif p.exists():
+                for url in mime.urls():
+                    p = Path(url.toLocalFile())
+                    if p.exists() and p.suffix.lower() != '.json':
+                        self.open_image(p)
 
     def add_zone(self):
         if not self.pil_image:
@@ -595,38 +1671,120 @@ class MainWindow(QMainWindow):
             return
         color = self.palette[len(self.zones) % len(self.palette)]
         z = ZoneItem(self.scene, name, x, y, frame_w, frame_h, rows, cols, pad_x, pad_y, color)
-        def on_size_changed(w, h, zone):
-            try:
-                idx = self.zones.index(zone)
-            except ValueError:
-                return
-            if self.zone_list.currentRow() == idx:
-                self.z_w.setValue(w)
-                self.z_h.setValue(h)
-                self.show_status("Frame size updated", 1600)
-        z.on_frame_size_changed = on_size_changed
+        self.undo_stack.push(ZonesCommand(self, [z], True, "Add zone"))
+        self.show_status("Zone added", 1000)
 
-        self.zones.append(z)
+    def on_zone_size_changed(self, w: int, h: int, zone: 'ZoneItem'):
+        try:
+            idx = self.zones.index(zone)
+        except ValueError:
+            return
+        if self.zone_list.currentRow() == idx:
+            self.z_w.setValue(w)
+            self.z_h.setValue(h)
+            self.show_status("Frame size updated", 1600)
+
+    def zone_icon(self, color: QColor) -> QIcon:
+        key = color.rgba()
+        icon = self.zone_icons.get(key)
+        if icon is None:
+            icon = QIcon(makerndpixmap(color))
+            self.zone_icons[key] = icon
+        return icon
+
+    def attach_zone(self, z: ZoneItem):
+        z.on_frame_size_changed = self.on_zone_size_changed
+        z.on_changed = self.refresh_zone
+        z.undo_stack = self.undo_stack
+        z.timings = self.timings
         self.scene.addItem(z)
+
+    def register_zone(self, z: ZoneItem, index: Optional[int] = None):
+        self.attach_zone(z)
+        if index is None:
+            index = len(self.zones)
+        self.zones.insert(index, z)
         item = QListWidgetItem(z.name)
-        pix = makerndpixmap(z.color)
-        item.setIcon(QIcon(pix))
+        item.setIcon(self.zone_icon(z.color))
         item.setSizeHint(QSize(110, 80))
-        self.zone_list.addItem(item)
-        self.zone_list.setCurrentRow(self.zone_list.count() - 1)
-        self.show_status("Zone added", 1000)
+        self.zone_list.insertItem(index, item)
+
+    def register_zones(self, zones: List[ZoneItem], indexes: Optional[List[int]] = None):
+        # one repaint and one list relayout for the whole batch
+        self.view.setUpdatesEnabled(False)
+        self.zone_list.setUpdatesEnabled(False)
+        self.zone_list.blockSignals(True)
+        try:
+            if indexes is None:
+                # appending: the list rows are created by a single addItems call
+                start = len(self.zones)
+                self.zones.extend(zones)
+                self.zone_list.addItems([z.name for z in zones])
+                size = QSize(110, 80)
+                for row, z in enumerate(zones, start):
+                    self.attach_zone(z)
+                    item = self.zone_list.item(row)
+                    item.setIcon(self.zone_icon(z.color))
+                    item.setSizeHint(size)
+            else:
+                for index, z in sorted(zip(indexes, zones), key=lambda p: p[0]):
+                    self.register_zone(z, index)
+        finally:
+            self.zone_list.blockSignals(False)
+            self.zone_list.setUpdatesEnabled(True)
+            self.view.setUpdatesEnabled(True)
+        last = self.zones.index(zones[-1]) if zones else self.zone_list.count() - 1
+        self.zone_list.setCurrentRow(last)
+        self.on_zone_selected(last)
+
+    def unregister_zones(self, zones: List[ZoneItem]) -> List[int]:
+        indexes = [self.zones.index(z) for z in zones]
+        self.zone_list.blockSignals(True)
+        try:
+            for index in sorted(indexes, reverse=True):
+                z = self.zones.pop(index)
+                z.release_all()
+                self.scene.removeItem(z)
+                self.zone_list.takeItem(index)
+        finally:
+            self.zone_list.blockSignals(False)
+        self.on_zone_selected(self.zone_list.currentRow())
+        return indexes
+
+    def refresh_zone(self, z: ZoneItem):
+        try:
+            idx = self.zones.index(z)
+        except ValueError:
+            return
+        item = self.zone_list.item(idx)
+        item.setText(z.name)
+        item.setIcon(self.zone_icon(z.color))
+        if self.zone_list.currentRow() == idx:
+            self.on_zone_selected(idx)
+
+    def detect_sprites(self):
+        if not self.pil_image:
+            self.show_status("Load an image first", 2000)
+            return
+        with self.timings.stage('detect_sprites'):
+            boxes = findsprites(self.pil_image, parsebg(self.bg_line.text()))
+        if not boxes:
+            self.show_status("No sprites found", 1600)
+            return
+        base = len(self.zones)
+        zones = []
+        for i, (x, y, w, h) in enumerate(boxes):
+            color = self.palette[(base + i) % len(self.palette)]
+            zones.append(ZoneItem(self.scene, f"auto{base + i}", x, y, w, h, 1, 1, 0, 0, color))
+        self.undo_stack.push(ZonesCommand(self, zones, True, "Detect sprites"))
+        self.show_status(f"Detected {len(zones)} sprites", 2000)
 
     def delete_selected_zone(self):
         idx = self.zone_list.currentRow()
         if idx < 0:
             self.show_status("No zone selected to delete", 1500)
             return
-        z = self.zones.pop(idx)
-        for f in list(z.frames):
-            self.scene.removeItem(f)
-        self.scene.removeItem(z.origin_marker)
-        self.scene.removeItem(z)
-        self.zone_list.takeItem(idx)
+        self.undo_stack.push(ZonesCommand(self, [self.zones[idx]], False, "Delete zone"))
         self.show_status("Zone deleted", 1200)
 
     def enable_origin_pick(self):
@@ -642,14 +1800,71 @@ class MainWindow(QMainWindow):
             x = int(round(pos.x()))
             y = int(round(pos.y()))
             z = self.zones[self.zone_list.currentRow()]
-            z.set_origin(x, y)
-            self.z_x.setValue(x)
-            self.z_y.setValue(y)
+            before = z.fields()
+            z.push(ZoneEditCommand(z, {'origin': before['origin'], 'moved': before['moved']},
+                                   {'origin': (x, y), 'moved': {}}, "Set origin"))
             self.show_status(f"Zone origin set to ({x}, {y})", 2000)
             self.view.mousePressEvent = old_handler
 
         self.view.mousePressEvent = one_shot
 
+    def enable_grid_infer(self):
+        idx = self.zone_list.currentRow()
+        if idx < 0 or not self.pil_image:
+            self.show_status("Select a zone first", 1600)
+            return
+        self.show_status("Drag over the frames to analyse", 4000)
+        old_press = self.view.mousePressEvent
+        old_move = self.view.mouseMoveEvent
+        old_release = self.view.mouseReleaseEvent
+        band = QGraphicsRectItem()
+        band.setPen(QPen(QColor(255, 255, 255, 200), 0, Qt.DashLine))
+        band.setZValue(100)
+        start = []
+
+        def press(e):
+            start.append(self.view.mapToScene(e.position().toPoint()))
+            band.setRect(QRectF(start[0], start[0]))
+            self.scene.addItem(band)
+
+        def move(e):
+            if start:
+                band.setRect(QRectF(start[0], self.view.mapToScene(e.position().toPoint())).normalized())
+
+        def release(e):
+            self.view.mousePressEvent = old_press
+            self.view.mouseMoveEvent = old_move
+            self.view.mouseReleaseEvent = old_release
+            if not start:
+                return
+            self.scene.removeItem(band)
+            self.infer_grid(band.rect().toAlignedRect())
+
+        self.view.mousePressEvent = press
+        self.view.mouseMoveEvent = move
+        self.view.mouseReleaseEvent = release
+
+    def infer_grid(self, area: QRect):
+        area = area.intersected(QRect(0, 0, self.pil_image.width, self.pil_image.height))
+        if area.isEmpty():
+            self.show_status("Selection is outside the image", 1600)
+            return
+        crop = self.pil_image.crop((area.x(), area.y(), area.x() + area.width(), area.y() + area.height()))
+        grid = infergrid(foreground(crop, parsebg(self.bg_line.text())))
+        if grid is None:
+            self.show_status("No sprites in selection", 1600)
+            return
+        self.z_x.setValue(area.x() + grid['x'])
+        self.z_y.setValue(area.y() + grid['y'])
+        self.z_w.setValue(grid['frame_w'])
+        self.z_h.setValue(grid['frame_h'])
+        self.z_pad_x.setValue(grid['pad_x'])
+        self.z_pad_y.setValue(grid['pad_y'])
+        self.z_rows.setValue(grid['rows'])
+        self.z_cols.setValue(grid['cols'])
+        self.apply_zone_changes()
+        self.show_status(f"Grid: {grid['cols']}x{grid['rows']} of {grid['frame_w']}x{grid['frame_h']}", 2500)
+
     def copy_zone(self):
         idx = self.zone_list.currentRow()
         if idx < 0:
@@ -657,10 +1872,7 @@ class MainWindow(QMainWindow):
             return
         z = self.zones[idx]
         r = z.rect()
-        frames_offsets = []
-        for f in z.frames:
-            sp = f.scenePos()
-            frames_offsets.append((int(sp.x() - r.x()), int(sp.y() - r.y())))
+        frames_offsets = z.frame_offsets()
         self.copied_zone = {
             'name': z.name + '_copy',
             'frame_w': z.frame_w,
@@ -684,33 +1896,16 @@ class MainWindow(QMainWindow):
         new_origin = (ox + 10, oy + 10)
         z = ZoneItem(self.scene, data['name'], new_origin[0], new_origin[1], data['frame_w'], data['frame_h'],
                      data['rows'], data['cols'], data['pad_x'], data['pad_y'], data['color'])
-        for i, f in enumerate(z.frames):
-            if i < len(data['frames_offsets']):
-                offx, offy = data['frames_offsets'][i]
-                f.setPos(new_origin[0] + offx, new_origin[1] + offy)
-        def on_size_changed(w, h, zone):
-            try:
-                idx = self.zones.index(zone)
-            except ValueError:
-                return
-            if self.zone_list.currentRow() == idx:
-                self.z_w.setValue(w)
-                self.z_h.setValue(h)
-        z.on_frame_size_changed = on_size_changed
-        self.zones.append(z)
-        self.scene.addItem(z)
-        item = QListWidgetItem(z.name)
-        pix = makerndpixmap(z.color)
-        item.setIcon(QIcon(pix))
-        item.setSizeHint(QSize(110, 80))
-        self.zone_list.addItem(item)
-        self.zone_list.setCurrentRow(self.zone_list.count() - 1)
+        z.set_frame_offsets(data['frames_offsets'])
+        self.undo_stack.push(ZonesCommand(self, [z], True, "Paste zone"))
         self.show_status("Zone pasted", 1200)
 
     def on_zone_selected(self, idx: int):
         if idx < 0 or idx >= len(self.zones):
+            self.preview.set_zone(None)
             return
         z = self.zones[idx]
+        self.preview.set_zone(z)
         self.z_name.setText(z.name)
         r = z.rect()
         self.z_x.setValue(int(r.x()))
@@ -728,21 +1923,24 @@ class MainWindow(QMainWindow):
             self.show_status("Select a zone first", 1300)
             return
         z = self.zones[idx]
-        z.name = self.z_name.text()
-        self.zone_list.currentItem().setText(z.name)
-        nx = self.z_x.value()
-        ny = self.z_y.value()
-        z.setRect(nx, ny, z.rect().width(), z.rect().height())
-        fw = self.z_w.value()
-        fh = self.z_h.value()
-        z.frame_w = fw
-        z.frame_h = fh
-        z.rows = self.z_rows.value()
-        z.cols = self.z_cols.value()
-        z.pad_x = self.z_pad_x.value()
-        z.pad_y = self.z_pad_y.value()
-        z.generate_frames()
-        self.update_zone_list_icon(idx)
+        before = z.fields()
+        after = dict(before)
+        after.update({
+            'name': self.z_name.text(),
+            'origin': (self.z_x.value(), self.z_y.value()),
+            'frame_w': self.z_w.value(),
+            'frame_h': self.z_h.value(),
+            'rows': self.z_rows.value(),
+            'cols': self.z_cols.value(),
+            'pad_x': self.z_pad_x.value(),
+            'pad_y': self.z_pad_y.value(),
+            'moved': {},
+        })
+        changed = [k for k in after if after[k] != before[k]]
+        if not changed:
+            self.show_status("Nothing to apply", 1000)
+            return
+        z.push(ZoneEditCommand(z, {k: before[k] for k in changed}, {k: after[k] for k in changed}))
         self.show_status("Zone applied", 1000)
 
     def set_zone_color(self):
@@ -755,21 +1953,9 @@ class MainWindow(QMainWindow):
             self.show_status("Color pick cancelled", 1000)
             return
         z = self.zones[idx]
-        z.color = col
-        z.setBrush(QBrush(QColor(col.red(), col.green(), col.blue(), 30)))
-        z.update_frame_size(z.frame_w, z.frame_h)
-        z.update_origin_marker()
-        self.update_zone_list_icon(idx)
+        z.push(ZoneEditCommand(z, {'color': QColor(z.color)}, {'color': col}, "Zone color"))
         self.show_status("Zone color updated", 1000)
 
-    def update_zone_list_icon(self, idx: int):
-        if idx < 0:
-            return
-        item = self.zone_list.item(idx)
-        z = self.zones[idx]
-        pix = makerndpixmap(z.color)
-        item.setIcon(QIcon(pix))
-
     def pick_bg_color(self):
         self.show_status("Click on imagee to pick color", 4000)
         old_handler = self.view.mousePressEvent
@@ -797,59 +1983,113 @@ class MainWindow(QMainWindow):
             self.show_status(f"Picked color: {hexv}", 1400)
 
     def export_zip(self):
+        self.start_export('zip')
+
+    def export_atlas(self):
+        self.start_export('atlas')
+
+    def start_export(self, kind: str):
+        if self.export_thread is not None:
+            self.show_status("An export is already running", 1600)
+            return
         if not self.pil_image:
             self.show_status("Load an image first", 1600)
             return
-        sheet = self.sheet_input.text().strip()
-        if not sheet:
+        if not self.sheet_input.text().strip():
             self.show_status("Please set a sheet export name", 1600)
             return
-        folder = QFileDialog.getExistingDirectory(self, "Export to folder (a ZIP will also be created)")
+        title = "Export to folder (a ZIP will also be created)" if kind == 'zip' else "Export atlas to folder (PNG + JSON)"
+        folder = QFileDialog.getExistingDirectory(self, title)
         if not folder:
             self.show_status("Export cancelled", 1000)
             return
-        out_zip_path = Path(folder) / f"{sheet}.zip"
-        bg_hex = self.bg_line.text().strip()
-        bg_rgb = None
-        try:
-            if bg_hex.startswith('#'):
-                bg_hex = bg_hex[1:]
-            if len(bg_hex) == 6:
-                bg_rgb = (int(bg_hex[0:2], 16), int(bg_hex[2:4], 16), int(bg_hex[4:6], 16))
-        except Exception:
-            bg_rgb = None
-
-        with zipfile.ZipFile(out_zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for z in self.zones:
-                frames_sorted = sorted(z.frames, key=lambda f: f.frame_index)
-                for f in frames_sorted:
-                    sp = f.scenePos()
-                    fx = int(round(sp.x()))
-                    fy = int(round(sp.y()))
-                    fw = int(round(f.rect().width()))
-                    fh = int(round(f.rect().height()))
-                    sx = max(0, min(self.pil_image.width, fx))
-                    sy = max(0, min(self.pil_image.height, fy))
-                    sw = max(0, min(self.pil_image.width - sx, fw))
-                    sh = max(0, min(self.pil_image.height - sy, fh))
-                    if sw <= 0 or sh <= 0:
-                        continue
-                    crop = self.pil_image.crop((sx, sy, sx + sw, sy + sh)).convert("RGBA")
-                    if bg_rgb is not None:
-                        datas = crop.getdata()
-                        newData = []
-                        for item in datas:
-                            if item[0] == bg_rgb[0] and item[1] == bg_rgb[1] and item[2] == bg_rgb[2]:
-                                newData.append((255, 255, 255, 0))
-                            else:
-                                newData.append(item)
-                        crop.putdata(newData)
-                    fid = f.frame_index
-                    filename = f"{sheet}_{z.name}{fid}.png"
-                    buf = io.BytesIO()
-                    crop.save(buf, format='PNG')
-                    zf.writestr(filename, buf.getvalue())
-        self.show_status(f"Exported ZIP to: {out_zip_path}", 3000)
+        self.sheet.export_target = (kind, Path(folder))
+        self.run_export(self.sheet, kind, Path(folder))
+
+    def run_export_queue(self):
+        while self.export_thread is None and self.export_queue:
+            sheet = self.export_queue.pop(0)
+            self.run_export(sheet, *sheet.export_target)
+
+    def run_export(self, target: Sheet, kind: str, folder: Path):
+        # the active sheet exports what the dock shows, others what was stashed
+        if target is self.sheet:
+            sheet, bg, img = self.sheet_input.text().strip(), self.bg_line.text(), self.pil_image
+        else:
+            sheet, bg, img = target.name.strip(), target.background, self.sheet_image(target)
+        if not sheet:
+            self.show_status(f"{target.path.name} has no export name, skipped", 1600)
+            return
+        out_path = folder / (f"{sheet}.zip" if kind == 'zip' else f"{sheet}_atlas.png")
+        options = {
+            'dedup': self.dedup_check.isChecked(),
+            'trim': self.trim_check.isChecked(),
+            'profile': self.profile_combo.currentText(),
+        }
+        if kind == 'zip':
+            options['cache'] = target.export_cache
+        else:
+            # the name defaults to the sheet's stem, never let the atlas replace a sheet
+            options['protect'] = [s.path for s in self.sheets]
+        # frame_rects() copies the geometry, later edits do not reach the running export
+        zones = [(z.name, z.frame_rects()) for z in target.zones]
+        thread = ExportThread(kind, img, sheet, zones, out_path, parsebg(bg), options, self)
+        thread.progress.connect(self.on_export_progress)
+        thread.finished.connect(self.on_export_finished)
+        self.export_thread = thread
+        self.export_btn.setEnabled(False)
+        self.atlas_btn.setEnabled(False)
+        self.export_progress.setRange(0, 0)
+        self.export_progress.setVisible(True)
+        self.cancel_export_btn.setEnabled(True)
+        self.cancel_export_btn.setVisible(True)
+        self.show_status("Preparing export...", 0)
+        thread.start()
+
+    def on_export_progress(self, done: int, total: int, zone: str):
+        self.export_progress.setRange(0, max(1, total))
+        self.export_progress.setValue(done)
+        self.show_status(f"Exporting {zone}: {done}/{total} frames", 0)
+
+    def cancel_export(self):
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.cancel_export_btn.setEnabled(False)
+            self.show_status("Cancelling export...", 0)
+
+    def on_export_finished(self):
+        thread = self.export_thread
+        self.export_thread = None
+        self.export_btn.setEnabled(True)
+        self.atlas_btn.setEnabled(True)
+        self.export_progress.setVisible(False)
+        self.cancel_export_btn.setVisible(False)
+        thread.deleteLater()
+        if thread.cancelled:
+            self.export_queue.clear()
+            self.show_status("Export cancelled, nothing was written", 2500)
+            return
+        if thread.error is not None:
+            self.show_status(f"Export failed: {thread.error}", 4000)
+            self.run_export_queue()
+            return
+        timings = thread.timings
+        self.last_export = timings
+        self.log_timings('export_' + thread.kind, timings)
+        size = humanbytes(thread.out_path.stat().st_size)
+        if thread.kind == 'zip':
+            reused = thread.options['cache'].hits
+            text = f"Exported ZIP to: {thread.out_path} ({thread.count} files, {reused} reused, {size} in {timings.wall:.2f}s)"
+        else:
+            text = f"Packed {thread.count} frames into: {thread.out_path} ({size} in {timings.wall:.2f}s)"
+        self.show_status(f"{text} - {timings.summary()}", 6000)
+        self.run_export_queue()
+
+    def closeEvent(self, event):
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.export_thread.wait()
+        super().closeEvent(event)
 
     # keyboard handling
     def keyPressEvent(self, event):
@@ -862,6 +2102,10 @@ class MainWindow(QMainWindow):
                 self.copy_zone(); return
             if event.key() == Qt.Key_V:
                 self.paste_zone(); return
+            if event.key() == Qt.Key_S:
+                self.save_project(); return
+            if event.key() == Qt.Key_O:
+                self.load_project(); return
         if event.key() == Qt.Key_Delete:
             self.delete_selected_zone(); return
         super().keyPressEvent(event)
@@ -869,22 +2113,35 @@ class MainWindow(QMainWindow):
 
 # Entrance
 
+def startup_done(mw: MainWindow, imported: float, built: float, quit_after: bool):
+    # runs on the first event loop turn after show(), i.e. once the window is up
+    now = time.perf_counter()
+    mw.timings.add('startup.imports', imported - STARTED)
+    mw.timings.add('startup.window', built - imported)
+    mw.timings.add('startup.show', now - built)
+    mw.timings.add('startup', now - STARTED)
+    mw.log_timings('startup')
+    if quit_after:
+        print(f"first window after {now - STARTED:.3f}s (imports {imported - STARTED:.3f}s, "
+              f"window {built - imported:.3f}s, show {now - built:.3f}s)")
+        QApplication.instance().quit()
+
+
 if __name__ == '__main__':
+    imported = time.perf_counter()
     app = QApplication(sys.argv)
 
-    families = QFontDatabase.families()
-    preferred = ['Segoe UI', 'Helvetica', 'Arial']
-    chosen = None
-    for p in preferred:
-        if p in families:
-            chosen = p
-            break
-    if chosen:
-        app.setFont(QFont(chosen, 10))
-    else:
-        app.setFont(QFont('', 10))
+    # the first installed family wins when the font is matched, so there is no
+    # need to enumerate the font database (slow with many fonts installed)
+    font = QFont()
+    font.setFamilies(['Segoe UI', 'Helvetica', 'Arial'])
+    font.setPointSize(10)
+    app.setFont(font)
+    # installed before any widget exists, so each widget is polished only once
+    app.setStyleSheet(QSS_DARK)
 
     mw = MainWindow()
-    app.setStyleSheet(QSS_DARK)
+    built = time.perf_counter()
     mw.show()
+    QTimer.singleShot(0, lambda: startup_done(mw, imported, built, '--startup-time' in sys.argv))
     sys.exit(app.exec())
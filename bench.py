@@ -0,0 +1,243 @@
+# Splitesheet benchmarks: synthetic sheets through the load, zone and export hot paths
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Callable
+
+import numpy as np
+from PIL import Image
+
+from splitecore import removebg, exportzip, zoneframes, loadsheet, PixelCache, PROFILES
+
+BG = (255, 0, 255)
+
+
+def makesheet(width: int, height: int, frame: int, frames: Optional[int] = None,
+              coverage: float = 0.5, seed: int = 0) -> tuple:
+    # a grid of frame x frame cells on a solid background; every cell holds a noisy
+    # sprite covering `coverage` of its area, the rest of the sheet stays background
+    rng = np.random.default_rng(seed)
+    cols = max(1, width // frame)
+    rows = max(1, height // frame)
+    count = min(frames or rows * cols, rows * cols)
+    rows = -(-count // cols)
+    arr = np.empty((height, width, 4), dtype=np.uint8)
+    arr[...] = BG + (255,)
+    side = max(1, int(round(frame * coverage ** 0.5)))
+    off = (frame - side) // 2
+    palette = rng.integers(0, 255, (16, 4), dtype=np.uint8)
+    palette[:, 3] = 255
+    for i in range(count):
+        r, c = divmod(i, cols)
+        y, x = r * frame + off, c * frame + off
+        arr[y:y + side, x:x + side] = palette[rng.integers(0, 16, (side, side))]
+    zone = {'name': 'bench', 'origin': [0, 0], 'frame_w': frame, 'frame_h': frame,
+            'rows': rows, 'cols': cols, 'pad_x': 0, 'pad_y': 0}
+    return Image.fromarray(arr, 'RGBA'), zone, count
+
+
+def rsskb(field: str) -> Optional[int]:
+    # VmRSS / VmHWM from procfs; None where that is not available
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def resetpeak():
+    # Linux lets a process reset its own high-water mark
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+    except OSError:
+        pass
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    # best and median of `repeat` timed runs, then one untimed run for memory:
+    # resident peak covers Pillow/Qt buffers, tracemalloc covers Python and NumPy.
+    # `setup` runs untimed before every run, e.g. to reset state the bench changes
+    setup = setup or (lambda: None)
+    times = []
+    for _ in range(repeat):
+        setup()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    setup()
+    base = rsskb('VmRSS')
+    resetpeak()
+    tracemalloc.start()
+    fn()
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    hwm = rsskb('VmHWM')
+    return {
+        'best_s': times[0],
+        'median_s': times[len(times) // 2],
+        'peak_rss_mb': None if base is None or hwm is None else max(0, hwm - base) / 1024,
+        'peak_py_mb': py_peak / (1024 * 1024),
+    }
+
+
+def corebenches(img: Image.Image, zone: Dict[str, Any], count: int, tmp: Path) -> List[tuple]:
+    frames = [(zone['name'], zoneframes(zone))]
+    mpx = img.width * img.height / 1e6
+    sheet_path = tmp / 'bench_load.png'
+    img.save(sheet_path)
+    pixels = PixelCache(tmp / 'pixels')
+    loadsheet(sheet_path, pixels)
+    benches = [
+        ('load_sheet[decode]', lambda: loadsheet(sheet_path), mpx, 'Mpx/s'),
+        ('load_sheet[mapped]', lambda: loadsheet(sheet_path, pixels), mpx, 'Mpx/s'),
+        ('removebg', lambda: removebg(img, BG), mpx, 'Mpx/s'),
+    ]
+    for profile in PROFILES:
+        out = tmp / f"bench_{profile}.zip"
+        benches.append((f"export_zip[{profile}]",
+                        lambda out=out, profile=profile: exportzip(img, 'bench', frames, out, BG, profile=profile),
+                        count, 'frames/s'))
+    return benches
+
+
+def qtbenches(img: Image.Image, zone: Dict[str, Any], count: int, tmp: Path) -> List[tuple]:
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QColor
+    app = QApplication.instance() or QApplication([])
+    import Splitesheet
+
+    mpx = img.width * img.height / 1e6
+    sheet_path = tmp / 'bench_sheet.png'
+    img.save(sheet_path)
+    window = Splitesheet.MainWindow()
+    z = Splitesheet.ZoneItem(window.scene, 'bench', 0, 0, zone['frame_w'], zone['frame_h'],
+                             zone['rows'], zone['cols'], 0, 0, QColor(200, 80, 80))
+    window.scene.addItem(z)
+    sizes = [(zone['frame_w'] + 1, zone['frame_h'] + 1), (zone['frame_w'], zone['frame_h'])]
+
+    def resize():
+        for w, h in sizes:
+            z.update_frame_size(w, h)
+
+    def load():
+        window.open_image(sheet_path)
+        app.processEvents()
+
+    def unload():
+        # open_image only switches tabs for a sheet that is already open, so every
+        # run starts with the sheet closed and its decoded pixels evicted
+        for i, sheet in reversed(list(enumerate(window.sheets))):
+            window.close_sheet(i)
+        window.images.clear()
+        app.processEvents()
+
+    frames = zone['rows'] * zone['cols']
+    return [
+        ('piltoqimg', lambda: Splitesheet.piltoqimg(img), mpx, 'Mpx/s'),
+        ('open_image', load, mpx, 'Mpx/s', unload),
+        ('generate_frames', z.generate_frames, frames, 'frames/s'),
+        ('update_frame_size', resize, frames * len(sizes), 'frames/s'),
+    ]
+
+
+def startupbench(name: str, *args: str) -> tuple:
+    # a fresh interpreter running Splitesheet.py, so imports are paid every time;
+    # `export --help` is the headless path, `--startup-time` quits at the first window
+    script = str(Path(__file__).with_name('Splitesheet.py'))
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    def run():
+        subprocess.run([sys.executable, script, *args], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (name, run, 1, 'runs/s')
+
+
+def versions() -> Dict[str, Any]:
+    info = {'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'pillow': Image.__version__}
+    try:
+        import PySide6
+        info['pyside6'] = PySide6.__version__
+    except ImportError:
+        info['pyside6'] = None
+    return info
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path):
+    # speedup of every bench against an earlier JSON report
+    with open(baseline_path, 'r', encoding='utf-8') as fh:
+        old = {r['name']: r for r in json.load(fh).get('results', [])}
+    for r in results:
+        prev = old.get(r['name'])
+        if prev and prev.get('best_s'):
+            print(f"{r['name']:<24} {prev['best_s'] / r['best_s']:6.2f}x  "
+                  f"({prev['best_s'] * 1000:.1f} -> {r['best_s'] * 1000:.1f} ms)", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="bench", description="Time Splitesheet hot paths on synthetic sheets")
+    ap.add_argument('--size', default='2048x2048', help="sheet size as WIDTHxHEIGHT")
+    ap.add_argument('--frame', type=int, default=32, help="frame edge in pixels")
+    ap.add_argument('--frames', type=int, default=None, help="number of frames (default: fill the sheet)")
+    ap.add_argument('--coverage', type=float, default=0.5, help="share of every frame covered by the sprite")
+    ap.add_argument('--repeat', type=int, default=3, help="timed runs per bench")
+    ap.add_argument('--only', default=None, help="comma separated bench names to run")
+    ap.add_argument('--no-qt', action='store_true', help="skip the benches that need Qt")
+    ap.add_argument('-o', '--out', type=Path, default=None, help="write the JSON report here as well")
+    ap.add_argument('--compare', type=Path, default=None, help="earlier JSON report to print speedups against")
+    args = ap.parse_args(argv)
+
+    try:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+    except ValueError:
+        ap.error("--size must look like 2048x2048")
+    img, zone, count = makesheet(width, height, args.frame, args.frames, args.coverage)
+    only = set(args.only.split(',')) if args.only else None
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        benches = corebenches(img, zone, count, Path(tmp)) + [startupbench('startup_headless', 'export', '--help')]
+        if not args.no_qt:
+            try:
+                benches += qtbenches(img, zone, count, Path(tmp)) + [startupbench('startup_gui', '--startup-time')]
+            except ImportError as e:
+                print(f"skipping Qt benches: {e}", file=sys.stderr)
+        for name, fn, work, unit, *setup in benches:
+            if only and name not in only and name.split('[')[0] not in only:
+                continue
+            r = measure(fn, max(1, args.repeat), *setup)
+            r.update({'name': name, 'throughput': work / r['best_s'] if r['best_s'] else None, 'unit': unit})
+            results.append(r)
+            print(f"{name:<24} {r['best_s'] * 1000:9.1f} ms  {r['throughput']:10.1f} {unit}", file=sys.stderr)
+
+    report = {
+        'versions': versions(),
+        'params': {'width': width, 'height': height, 'frame': args.frame, 'frames': count,
+                   'coverage': args.coverage, 'repeat': args.repeat},
+        'results': results,
+    }
+    text = json.dumps(report, indent=1)
+    print(text)
+    if args.out:
+        args.out.write_text(text + '\n', encoding='utf-8')
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1124 @@
+# Splitesheet core: slicing & export without Qt
+from __future__ import annotations
+
+import os
+import sys
+import time
+import io
+import mmap
+import struct
+import json
+import zipfile
+import hashlib
+import threading
+import argparse
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Tuple, Callable
+
+from PIL import Image, ImageChops
+
+# NumPy, SciPy and the thread pool are imported where they are used, so importing
+# this module stays cheap for the GUI at startup and for exports that skip analysis
+if TYPE_CHECKING:
+    import numpy as np
+
+
+Frame = Tuple[int, int, int, int, int]  # index, x, y, w, h
+Progress = Callable[[int, int, str], None]  # frames done, frames total, current zone
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def parsebg(text: str) -> Optional[tuple]:
+    bg_hex = text.strip()
+    if bg_hex.startswith('#'):
+        bg_hex = bg_hex[1:]
+    if len(bg_hex) != 6:
+        return None
+    try:
+        return (int(bg_hex[0:2], 16), int(bg_hex[2:4], 16), int(bg_hex[4:6], 16))
+    except ValueError:
+        return None
+
+
+def removebg(img: Image.Image, rgb: tuple, tolerance: int = 0) -> Image.Image:
+    # builds the mask with per-band lookup tables so the whole sheet is done in C;
+    # tolerance 0 is the exact match the exporter always used
+    img = img.convert("RGBA")
+    mask = None
+    for band, value in zip(img.split()[:3], rgb):
+        m = band.point([255 if abs(i - value) <= tolerance else 0 for i in range(256)])
+        mask = m if mask is None else ImageChops.multiply(mask, m)
+    img.paste((255, 255, 255, 0), (0, 0, img.width, img.height), mask)
+    return img
+
+
+def zoneframes(zone: Dict[str, Any]) -> List[Frame]:
+    ox, oy = zone.get('origin', (0, 0))
+    fw, fh = int(zone['frame_w']), int(zone['frame_h'])
+    rows, cols = int(zone.get('rows', 1)), int(zone.get('cols', 1))
+    pad_x, pad_y = int(zone.get('pad_x', 0)), int(zone.get('pad_y', 0))
+    offsets = zone.get('frames_offsets') or []
+    moved = {int(i): (offx, offy) for i, offx, offy in zone.get('moved', [])}
+    frames = []
+    idx = 0
+    for r in range(rows):
+        for c in range(cols):
+            if idx in moved:
+                offx, offy = moved[idx]
+            elif idx < len(offsets):
+                offx, offy = offsets[idx]
+            else:
+                offx, offy = c * (fw + pad_x), r * (fh + pad_y)
+            frames.append((idx, int(ox) + int(offx), int(oy) + int(offy), fw, fh))
+            idx += 1
+    return frames
+
+
+def cliprect(x: int, y: int, w: int, h: int, width: int, height: int) -> Optional[tuple]:
+    sx = max(0, min(width, x))
+    sy = max(0, min(height, y))
+    sw = max(0, min(width - sx, w))
+    sh = max(0, min(height - sy, h))
+    if sw <= 0 or sh <= 0:
+        return None
+    return (sx, sy, sx + sw, sy + sh)
+
+
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# PNG and archive settings per export profile. "default" reproduces the original
+# output; PNGs are already deflated, so "fast" and "small" store them as-is.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'fast': {'compress_level': 1, 'optimize': False, 'palette': False, 'zip': zipfile.ZIP_STORED},
+    'default': {'compress_level': 6, 'optimize': False, 'palette': False, 'zip': zipfile.ZIP_DEFLATED},
+    'small': {'compress_level': 9, 'optimize': True, 'palette': True, 'zip': zipfile.ZIP_STORED},
+}
+
+
+class Timings:
+    # Seconds and call counts per named stage plus plain counters (frames, bytes,
+    # cache hits). Encoder threads add to the same object, so stage totals are
+    # summed over threads and can exceed the wall time.
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.wall: Optional[float] = None
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        with self.lock:
+            st = self.stages.setdefault(name, [0.0, 0])
+            st[0] += seconds
+            st[1] += calls
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def finish(self) -> 'Timings':
+        self.wall = time.perf_counter() - self.started
+        return self
+
+    def report(self) -> Dict[str, Any]:
+        wall = self.wall if self.wall is not None else time.perf_counter() - self.started
+        return {
+            'wall_s': round(wall, 6),
+            'stages': {k: {'seconds': round(v[0], 6), 'calls': v[1]} for k, v in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def summary(self) -> str:
+        # slowest stages first, skipping the ones that did not register
+        ranked = sorted(self.stages.items(), key=lambda kv: -kv[1][0])
+        parts = [f"{k} {v[0]:.2f}s" for k, v in ranked if v[0] >= 0.005]
+        if 'bytes' in self.counters:
+            parts.append(f"{humanbytes(self.counters['bytes'])} encoded")
+        return ', '.join(parts)
+
+
+class LRUCache:
+    # Mapping that drops its least recently used entries once the summed cost
+    # exceeds the budget. Cost defaults to one per entry; pass e.g. a byte count
+    # to bound memory instead. The newest entry is always kept, even over budget.
+    def __init__(self, budget: int, cost: Callable[[Any], int] = lambda value: 1):
+        self.budget = budget
+        self.cost = cost
+        self.items: OrderedDict = OrderedDict()
+        self.costs: Dict[Any, int] = {}
+        self.used = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, key, default=None):
+        value = self.items.get(key, default)
+        if key in self.items:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.pop(key)
+        c = self.cost(value)
+        self.items[key] = value
+        self.costs[key] = c
+        self.used += c
+        self.trim()
+
+    def pop(self, key, default=None):
+        if key not in self.items:
+            return default
+        self.used -= self.costs.pop(key)
+        return self.items.pop(key)
+
+    def trim(self, budget: Optional[int] = None):
+        if budget is not None:
+            self.budget = budget
+        while self.used > self.budget and len(self.items) > 1:
+            key, _ = self.items.popitem(last=False)
+            self.used -= self.costs.pop(key)
+
+    def clear(self):
+        self.items.clear()
+        self.costs.clear()
+        self.used = 0
+
+
+class ExportCache:
+    # PNG bytes keyed by a hash of the frame pixels, rect and background. With a
+    # directory the entries live on disk so separate runs can reuse them, and a
+    # hit refreshes the file's mtime so prunedir() can drop long unused ones;
+    # otherwise in memory, pruned to what the last export actually used. Encoder
+    # threads share one cache, so the hit/miss counts are taken under a lock.
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else None
+        self.mem: Dict[str, bytes] = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = None
+        if not self.directory:
+            data = self.mem.get(key)
+        else:
+            path = self.directory / f"{key}.png"
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except OSError:
+                pass
+        with self.lock:
+            self.used.add(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        with self.lock:
+            self.used.add(key)
+        if not self.directory:
+            self.mem[key] = data
+            return
+        path = self.directory / f"{key}.png"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def begin(self):
+        self.used = set()
+        self.hits = self.misses = 0
+
+    def prune(self):
+        self.mem = {k: v for k, v in self.mem.items() if k in self.used}
+
+    def prunedir(self, max_age_days: float) -> int:
+        # removes cache files no export has used for max_age_days; only names that
+        # look like cache keys are touched, in case the folder holds other files
+        if not self.directory:
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for path in self.directory.glob('*.png'):
+            if len(path.stem) != 40 or not all(c in '0123456789abcdef' for c in path.stem):
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class PixelCache:
+    # Decoded RGBA pixels of whole sheets on disk, keyed by the file's path, size
+    # and mtime. A hit is memory-mapped instead of decoded: the image shares the
+    # mapping, so crops read straight from it and only touched pages become
+    # resident. Each sheet keeps one entry, a newer version of the file replaces it.
+    magic = b'SPRGBA01'
+    header = struct.Struct('<8sII')
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def entry(self, path: Path) -> Tuple[str, Path]:
+        resolved = str(Path(path).resolve())
+        st = os.stat(resolved)
+        prefix = hashlib.blake2b(resolved.encode(), digest_size=10).hexdigest()
+        stamp = hashlib.blake2b(repr((st.st_size, st.st_mtime_ns)).encode(), digest_size=10).hexdigest()
+        return prefix, self.directory / f"{prefix}_{stamp}.rgba"
+
+    def load(self, entry: Tuple[str, Path]) -> Optional[Image.Image]:
+        try:
+            with open(entry[1], 'rb') as fh:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mm) >= self.header.size:
+            magic, w, h = self.header.unpack_from(mm)
+            if magic == self.magic and len(mm) == self.header.size + w * h * 4:
+                # read-only and zero-copy; Pillow copies first if anything writes to it
+                return Image.frombuffer("RGBA", (w, h), memoryview(mm)[self.header.size:], 'raw', "RGBA", 0, 1)
+        mm.close()
+        return None
+
+    def store(self, entry: Tuple[str, Path], img: Image.Image, strip_rows: int = 256):
+        prefix, path = entry
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, 'wb') as fh:
+                fh.write(self.header.pack(self.magic, img.width, img.height))
+                # a strip at a time, so storing never needs a second full-size copy
+                for y in range(0, img.height, strip_rows):
+                    fh.write(img.crop((0, y, img.width, min(img.height, y + strip_rows))).tobytes())
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        for old in self.directory.glob(f"{prefix}_*.rgba"):
+            if old != path:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass  # still mapped on platforms that lock mapped files
+
+
+def loadsheet(path: Path, pixels: Optional[PixelCache] = None) -> Image.Image:
+    # The sheet as RGBA. With a pixel cache an unchanged file is mapped instead of
+    # decoded; a new one is decoded once, stored, and then served from the mapping
+    # as well so the decoded copy can be dropped.
+    entry = None
+    if pixels is not None:
+        entry = pixels.entry(path)
+        img = pixels.load(entry)
+        if img is not None:
+            pixels.hits += 1
+            return img
+        pixels.misses += 1
+    with Image.open(path) as im:
+        img = im.convert("RGBA")
+    if entry is not None:
+        # the stamp was taken before decoding, so a save during it is not cached as current
+        pixels.store(entry, img)
+        img = pixels.load(entry) or img
+    return img
+
+
+def framekey(crop: Image.Image, box: tuple, bg_rgb: Optional[tuple], profile: str = 'default') -> str:
+    h = hashlib.blake2b(digest_size=20)
+    # default keys stay as they were so existing cache folders keep working
+    h.update(repr((crop.mode, box, bg_rgb) if profile == 'default' else (crop.mode, box, bg_rgb, profile)).encode())
+    h.update(crop.tobytes())
+    return h.hexdigest()
+
+
+def paletted(img: Image.Image) -> Optional[Image.Image]:
+    # lossless P-mode copy (alpha kept in the palette) when there are at most 256 colors
+    import numpy as np
+    if img.getcolors(256) is None:
+        return None
+    arr = np.ascontiguousarray(np.asarray(img.convert("RGBA")))
+    colors, idx = np.unique(arr.view(np.uint32).reshape(-1), return_inverse=True)
+    pal = Image.fromarray(idx.reshape(arr.shape[:2]).astype(np.uint8), 'P')
+    pal.putpalette(colors.view(np.uint8).tobytes(), 'RGBA')
+    return pal
+
+
+def encodepng(img: Image.Image, profile: str = 'default') -> bytes:
+    opts = PROFILES[profile]
+    candidates = [img]
+    if opts['palette']:
+        pal = paletted(img)
+        if pal is not None:
+            candidates.append(pal)
+    best = None
+    for im in candidates:
+        buf = io.BytesIO()
+        im.save(buf, format='PNG', compress_level=opts['compress_level'], optimize=opts['optimize'])
+        if best is None or buf.tell() < len(best):
+            best = buf.getvalue()
+    return best
+
+
+def encodeframe(src: Image.Image, box: tuple, bg_rgb: Optional[tuple] = None,
+                cache: Optional[ExportCache] = None, profile: str = 'default',
+                timings: Optional[Timings] = None) -> bytes:
+    timings = timings if timings is not None else Timings()
+    with timings.stage('crop'):
+        crop = src.crop(box)
+    key = None
+    if cache is not None:
+        with timings.stage('hash'):
+            key = framekey(crop, box, bg_rgb, profile)
+            data = cache.get(key)
+        if data is not None:
+            return data
+    with timings.stage('encode'):
+        data = encodepng(crop, profile)
+    if cache is not None:
+        with timings.stage('cache_store'):
+            cache.put(key, data)
+    return data
+
+
+def humanbytes(n: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def writeentry(zf: zipfile.ZipFile, filename: str, data: bytes, compress_type: int = zipfile.ZIP_DEFLATED):
+    # fixed timestamp and permissions so identical frames give byte-identical archives
+    info = zipfile.ZipInfo(filename, date_time=ZIP_EPOCH)
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    zf.writestr(info, data)
+
+
+def collectframes(src: Image.Image, zones: List[Tuple[str, List[Frame]]],
+                  trim: bool = False) -> List[tuple]:
+    # (zone name, frame index, crop box, frame rect) for every frame on the sheet;
+    # with trim the crop box shrinks to the frame's opaque pixels
+    entries = []
+    for name, frames in zones:
+        for fid, fx, fy, fw, fh in sorted(frames):
+            box = cliprect(fx, fy, fw, fh, src.width, src.height)
+            if box is not None:
+                entries.append((name, fid, box, (fx, fy, fw, fh)))
+    if trim and entries:
+        boxes = contentboxes(foreground(src), [e[2] for e in entries])
+        for i, ((name, fid, box, frame), content) in enumerate(zip(entries, boxes)):
+            # an empty frame still needs an image, keep one transparent pixel
+            entries[i] = (name, fid, content or (box[0], box[1], box[0] + 1, box[1] + 1), frame)
+    return entries
+
+
+def trimmeta(box: tuple, frame: tuple) -> Dict[str, Any]:
+    # where the trimmed image goes inside the untrimmed frame
+    return {'offset': [box[0] - frame[0], box[1] - frame[1]], 'source_size': [frame[2], frame[3]]}
+
+
+def dedupframes(src: Image.Image, boxes: List[tuple]) -> List[int]:
+    # index of the first box with identical pixels for every box (its own index when
+    # unique); frames are grouped by a hash of their pixels and each match is then
+    # compared byte for byte, so a hash collision can never merge different frames
+    canon = []
+    seen: Dict[tuple, List[int]] = {}
+    for i, box in enumerate(boxes):
+        crop = src.crop(box)
+        raw = crop.tobytes()
+        key = (crop.size, hashlib.blake2b(raw, digest_size=16).digest())
+        match = i
+        for j in seen.get(key, ()):
+            if src.crop(boxes[j]).tobytes() == raw:
+                match = j
+                break
+        if match == i:
+            seen.setdefault(key, []).append(i)
+        canon.append(match)
+    return canon
+
+
+def checktargets(targets: List[Path], protect: List[Path]):
+    # refuses outputs that would overwrite one of the export's own inputs
+    inputs = {Path(p).resolve() for p in protect}
+    for target in targets:
+        if Path(target).resolve() in inputs:
+            raise ValueError(f"refusing to overwrite {target}, it is an input of this export")
+
+
+def checkcancel(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        raise ExportCancelled()
+
+
+def exportzip(img: Image.Image, sheet: str, zones: List[Tuple[str, List[Frame]]], out_path: Path,
+              bg_rgb: Optional[tuple] = None, workers: Optional[int] = None,
+              cache: Optional[ExportCache] = None, dedup: bool = False, trim: bool = False,
+              profile: str = 'default', timings: Optional[Timings] = None,
+              progress: Optional[Progress] = None, cancel: Optional[threading.Event] = None) -> int:
+    # Pillow drops the GIL while encoding, so threads keep all cores busy without
+    # copying the sheet into other processes. Results are written in submission
+    # order and at most `window` encoded frames are held at once. With dedup,
+    # repeated frames are stored once and listed in {sheet}_aliases.json; with
+    # trim, offsets and untrimmed sizes go to {sheet}_trim.json. The profile picks
+    # the PNG settings and whether frames are deflated again inside the archive.
+    # The archive is built next to out_path and only renamed into place once
+    # complete, so a cancelled or failed export leaves nothing behind.
+    timings = timings if timings is not None else Timings()
+    with timings.stage('removebg'):
+        src = img if bg_rgb is None else removebg(img, bg_rgb)
+    with timings.stage('collect'):
+        entries = [(f"{sheet}_{name}{fid}.png", box, frame, name)
+                   for name, fid, box, frame in collectframes(src, zones, trim)]
+    with timings.stage('dedup'):
+        canon = dedupframes(src, [e[1] for e in entries]) if dedup else range(len(entries))
+    aliases = []
+    packing = PROFILES[profile]['zip']
+    workers = max(1, workers or os.cpu_count() or 1)
+    window = workers * 2
+    total = len(entries)
+    done = 0
+    count = 0
+    if cache is not None:
+        cache.begin()
+
+    def flush(filename, zone, fut):
+        # time spent blocked on the pool shows up as 'wait', not as encoding
+        nonlocal done, count
+        with timings.stage('wait'):
+            data = fut.result()
+        with timings.stage('write'):
+            writeentry(zf, filename, data, packing)
+        timings.count('bytes', len(data))
+        count += 1
+        done += 1
+        if progress is not None:
+            progress(done, total, zone)
+
+    from concurrent.futures import ThreadPoolExecutor
+    part = Path(f"{out_path}.part")
+    try:
+        with zipfile.ZipFile(part, 'w', zipfile.ZIP_DEFLATED) as zf, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for i, (filename, box, _, zone) in enumerate(entries):
+                checkcancel(cancel)
+                if canon[i] != i:
+                    aliases.append([filename, entries[canon[i]][0]])
+                    done += 1
+                    continue
+                fut = pool.submit(encodeframe, src, box, bg_rgb, cache, profile, timings)
+                pending.append((filename, zone, fut))
+                if len(pending) >= window:
+                    flush(*pending.popleft())
+            while pending:
+                checkcancel(cancel)
+                flush(*pending.popleft())
+            with timings.stage('write'):
+                if dedup:
+                    writeentry(zf, f"{sheet}_aliases.json", dumpjson({'aliases': aliases}, 'aliases').encode())
+                if trim:
+                    frames_meta = [dict({'file': filename}, **trimmeta(box, frame))
+                                   for filename, box, frame, _ in entries]
+                    writeentry(zf, f"{sheet}_trim.json", dumpjson({'frames': frames_meta}, 'frames').encode())
+        os.replace(part, out_path)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    if cache is not None:
+        cache.prune()
+        timings.count('cache_hits', cache.hits)
+    timings.count('frames', total)
+    timings.count('files', count)
+    timings.count('aliases', len(aliases))
+    return count
+
+
+# Atlas
+
+def packskyline(sizes: List[tuple], width: int, padding: int = 0) -> Tuple[List[tuple], int]:
+    # Skyline bottom-left: the packed area's top edge is kept as a list of
+    # [x, y, w] segments and each rect goes where its top ends lowest. Rects are
+    # placed tallest first, which keeps the skyline flat and the segment list short.
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    skyline = [[0, 0, width]]
+    placed: List[Optional[tuple]] = [None] * len(sizes)
+    height = 0
+    for i in order:
+        w = sizes[i][0] + padding
+        h = sizes[i][1] + padding
+        best = None
+        for s in range(len(skyline)):
+            x = skyline[s][0]
+            if x + w > width:
+                break
+            # the rect rests on the highest segment it spans
+            y = 0
+            left = w
+            j = s
+            while left > 0:
+                y = max(y, skyline[j][1])
+                left -= skyline[j][2]
+                j += 1
+            if best is None or (y + h, x) < (best[0] + h, best[1]):
+                best = (y, x, s)
+        if best is None:
+            raise ValueError(f"frame {sizes[i][0]}x{sizes[i][1]} is wider than the atlas ({width})")
+        y, x, s = best
+        placed[i] = (x, y)
+        height = max(height, y + h)
+        # replace the covered span with the new segment, trimming the last one it overlaps
+        seg = [x, y + h, w]
+        end = x + w
+        j = s
+        while j < len(skyline) and skyline[j][0] < end:
+            sx, sy, sw = skyline[j]
+            if sx + sw > end:
+                skyline[j] = [end, sy, sx + sw - end]
+                break
+            j += 1
+        skyline[s:j] = [seg]
+        # merge neighbours at the same height
+        merged = [skyline[0]]
+        for sx, sy, sw in skyline[1:]:
+            if merged[-1][1] == sy:
+                merged[-1] = [merged[-1][0], sy, merged[-1][2] + sw]
+            else:
+                merged.append([sx, sy, sw])
+        skyline = merged
+    return placed, height
+
+
+def atlaswidth(sizes: List[tuple], padding: int = 0) -> int:
+    # power of two close to a square, but never narrower than the widest frame
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    widest = max((w + padding for w, _ in sizes), default=1)
+    width = 1
+    while width * width < area or width < widest:
+        width <<= 1
+    return width
+
+
+def exportatlas(img: Image.Image, sheet: str, zones: List[Tuple[str, List[Frame]]], out_path: Path,
+                bg_rgb: Optional[tuple] = None, padding: int = 1, width: Optional[int] = None,
+                dedup: bool = False, trim: bool = False, profile: str = 'default',
+                timings: Optional[Timings] = None, progress: Optional[Progress] = None,
+                cancel: Optional[threading.Event] = None, protect: List[Path] = ()) -> int:
+    # writes <out_path> as one packed PNG and a JSON descriptor next to it; with
+    # dedup, repeated frames share one rect and name the frame they duplicate,
+    # with trim each frame also records its offset and untrimmed size. Neither
+    # file may be one of the `protect` paths (the source sheet, the manifest).
+    out_path = Path(out_path)
+    checktargets([out_path, out_path.with_suffix('.json')], protect)
+    timings = timings if timings is not None else Timings()
+    with timings.stage('removebg'):
+        src = img if bg_rgb is None else removebg(img, bg_rgb)
+    with timings.stage('collect'):
+        entries = collectframes(src, zones, trim)
+    with timings.stage('dedup'):
+        canon = dedupframes(src, [e[2] for e in entries]) if dedup else list(range(len(entries)))
+    unique = [i for i, c in enumerate(canon) if c == i]
+    sizes = [(box[2] - box[0], box[3] - box[1]) for _, _, box, _ in entries]
+    usizes = [sizes[i] for i in unique]
+    with timings.stage('pack'):
+        width = width or atlaswidth(usizes, padding)
+        uplaced, height = packskyline(usizes, width, padding)
+    placed = dict(zip(unique, uplaced))
+    atlas = Image.new("RGBA", (width, max(1, height)), (0, 0, 0, 0))
+    frames_meta = []
+    with timings.stage('paste'):
+        for i, ((name, fid, box, frame), (w, h)) in enumerate(zip(entries, sizes)):
+            checkcancel(cancel)
+            x, y = placed[canon[i]]
+            meta = {
+                'name': f"{sheet}_{name}{fid}",
+                'zone': name,
+                'frame_index': fid,
+                'rect': [x, y, w, h],
+                'source': [box[0], box[1], w, h],
+            }
+            if trim:
+                meta.update(trimmeta(box, frame))
+            if canon[i] == i:
+                atlas.paste(src.crop(box), (x, y))
+            else:
+                cname, cfid = entries[canon[i]][:2]
+                meta['duplicate_of'] = f"{sheet}_{cname}{cfid}"
+            frames_meta.append(meta)
+            if progress is not None:
+                progress(i + 1, len(entries), name)
+    checkcancel(cancel)
+    with timings.stage('encode'):
+        data = encodepng(atlas, profile)
+    checkcancel(cancel)
+    with timings.stage('write'):
+        part = Path(f"{out_path}.part")
+        part.write_bytes(data)
+        os.replace(part, out_path)
+        meta = {'image': out_path.name, 'size': [atlas.width, atlas.height], 'frames': frames_meta}
+        writeatomic(out_path.with_suffix('.json'), dumpjson(meta, 'frames'))
+    timings.count('bytes', len(data))
+    timings.count('frames', len(entries))
+    timings.count('files', len(unique))
+    return len(entries)
+
+
+# Analysis
+
+def foreground(img: Image.Image, bg_rgb: Optional[tuple] = None) -> np.ndarray:
+    # True where a pixel is neither transparent nor the background color
+    import numpy as np
+    arr = np.asarray(img.convert("RGBA") if img.mode != "RGBA" else img)
+    mask = arr[..., 3] > 0
+    if bg_rgb is not None:
+        mask &= ~((arr[..., 0] == bg_rgb[0]) & (arr[..., 1] == bg_rgb[1]) & (arr[..., 2] == bg_rgb[2]))
+    return mask
+
+
+def contentboxes(mask: np.ndarray, boxes: List[tuple]) -> List[Optional[tuple]]:
+    # Tight (x0, y0, x1, y1) of the True pixels inside every box, None when a box
+    # is empty. Row-wise prefix sums of the mask and of its transpose give the
+    # occupied rows and columns of all boxes with one gather each, and reduceat
+    # picks the first and last of every box. The tables only cover the region the
+    # boxes span and use uint16 whenever a line fits, which keeps a 16k sheet's
+    # tables at a quarter of what int32 over the whole sheet would take.
+    import numpy as np
+    if not boxes:
+        return []
+    b = np.asarray(boxes, dtype=np.int64)
+    ox, oy = int(b[:, 0].min()), int(b[:, 1].min())
+    mask = mask[oy:int(b[:, 3].max()), ox:int(b[:, 2].max())]
+    x0, y0, x1, y1 = b[:, 0] - ox, b[:, 1] - oy, b[:, 2] - ox, b[:, 3] - oy
+
+    def span(table, lo, hi, a, z):
+        # first and last line in [lo, hi) with a True pixel between a and z
+        n = hi - lo
+        starts = np.concatenate(([0], np.cumsum(n)[:-1]))
+        owner = np.repeat(np.arange(len(n)), n)
+        pos = np.arange(int(n.sum())) - starts[owner] + lo[owner]
+        occ = table[pos, z[owner]] - table[pos, a[owner]] > 0
+        first = np.minimum.reduceat(np.where(occ, pos, np.iinfo(np.int64).max), starts)
+        last = np.maximum.reduceat(np.where(occ, pos, -1), starts)
+        return first, last
+
+    def prefix(m):
+        # cumsum along contiguous rows, which is several times faster than down
+        # columns; a count never exceeds the row length, and a later entry is never
+        # smaller than an earlier one, so unsigned differences cannot wrap
+        dtype = np.uint16 if m.shape[1] <= np.iinfo(np.uint16).max else np.int32
+        out = np.zeros((m.shape[0], m.shape[1] + 1), dtype=dtype)
+        # in bands: NumPy buffers a cumsum into the strided out[:, 1:] view, and
+        # the buffer is as large as the band
+        for r in range(0, m.shape[0], 256):
+            np.cumsum(m[r:r + 256], axis=1, dtype=dtype, out=out[r:r + 256, 1:])
+        return out
+
+    cy0, cy1 = span(prefix(mask), y0, y1, x0, x1)
+    cx0, cx1 = span(prefix(np.ascontiguousarray(mask.T)), x0, x1, y0, y1)
+    return [None if cx1[i] < 0 else (int(cx0[i]) + ox, int(cy0[i]) + oy, int(cx1[i]) + 1 + ox, int(cy1[i]) + 1 + oy)
+            for i in range(len(boxes))]
+
+
+def labelruns(mask: np.ndarray) -> tuple:
+    # 8-connected labeling over horizontal runs instead of pixels: runs touching a
+    # run in the previous row are found with searchsorted and merged with a
+    # vectorized union-find, so Python never loops per pixel or per run
+    import numpy as np
+    h, w = mask.shape
+    stride = w + 2
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    run_y, run_s = np.nonzero(edges == 1)
+    _, run_e = np.nonzero(edges == -1)
+    n = len(run_y)
+    if n == 0:
+        return run_y, run_s, run_e, np.zeros(0, np.int64)
+    start_key = run_y * stride + run_s
+    end_key = run_y * stride + run_e
+    prev = (run_y - 1) * stride
+    lo = np.searchsorted(end_key, prev + run_s - 1, side='right')
+    hi = np.searchsorted(start_key, prev + run_e + 1, side='left')
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    b = np.repeat(np.arange(n), counts)
+    a = np.repeat(lo, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+
+    parent = np.arange(n)
+    while total:
+        ra, rb = parent[a], parent[b]
+        if (ra == rb).all():
+            break
+        np.minimum.at(parent, np.maximum(ra, rb), np.minimum(ra, rb))
+        while True:
+            jumped = parent[parent]
+            if (jumped == parent).all():
+                break
+            parent = jumped
+    _, labels = np.unique(parent, return_inverse=True)
+    return run_y, run_s, run_e, labels
+
+
+def findsprites(img: Image.Image, bg_rgb: Optional[tuple] = None, min_area: int = 1) -> List[tuple]:
+    # bounding boxes (x, y, w, h) of connected sprites, in reading order
+    import numpy as np
+    mask = foreground(img, bg_rgb)
+    try:
+        from scipy import ndimage
+    except ImportError:
+        ndimage = None
+    if ndimage is not None:
+        labels, count = ndimage.label(mask, structure=np.ones((3, 3), bool))
+        areas = np.bincount(labels.ravel(), minlength=count + 1)
+        boxes = [(sl[1].start, sl[0].start, sl[1].stop - sl[1].start, sl[0].stop - sl[0].start)
+                 for i, sl in enumerate(ndimage.find_objects(labels), 1)
+                 if sl is not None and areas[i] >= min_area]
+    else:
+        run_y, run_s, run_e, labels = labelruns(mask)
+        count = int(labels.max()) + 1 if len(labels) else 0
+        x0 = np.full(count, mask.shape[1]); x1 = np.zeros(count, np.int64)
+        y0 = np.full(count, mask.shape[0]); y1 = np.zeros(count, np.int64)
+        area = np.zeros(count, np.int64)
+        np.minimum.at(x0, labels, run_s)
+        np.maximum.at(x1, labels, run_e)
+        np.minimum.at(y0, labels, run_y)
+        np.maximum.at(y1, labels, run_y + 1)
+        np.add.at(area, labels, run_e - run_s)
+        keep = np.nonzero(area >= min_area)[0]
+        boxes = [(int(x0[i]), int(y0[i]), int(x1[i] - x0[i]), int(y1[i] - y0[i])) for i in keep]
+    boxes.sort(key=lambda b: (b[1], b[0]))
+    return boxes
+
+
+def findpitch(occ: np.ndarray) -> int:
+    # period of an occupancy profile from its autocorrelation: the first local
+    # maximum past the central lobe that is close to the strongest repeat. Lags
+    # run up to the whole span, a row of two cells repeats past its middle.
+    import numpy as np
+    n = len(occ)
+    x = occ.astype(np.float64) - occ.mean()
+    if n < 4 or not x.any():
+        return 0
+    spec = np.fft.rfft(x, 2 * n)
+    ac = np.fft.irfft(spec * np.conj(spec))[:n]
+    below = np.nonzero(ac <= 0)[0]
+    if len(below) == 0:
+        return 0
+    lo, hi = int(below[0]), n
+    if hi - lo < 3:
+        return 0
+    seg = ac[lo:hi]
+    peaks = np.nonzero((seg[1:-1] >= seg[:-2]) & (seg[1:-1] >= seg[2:]) & (seg[1:-1] > 0))[0] + 1
+    if len(peaks) == 0:
+        return 0
+    strong = peaks[seg[peaks] >= 0.8 * seg[peaks].max()]
+    return int(lo + strong[0])
+
+
+def foldgap(span: np.ndarray, pitch: int) -> tuple:
+    # folds the profile onto one period and returns the longest empty stretch
+    # (wrapping around) as (length, end); it is the gutter between cells
+    import numpy as np
+    folded = np.zeros(pitch * -(-len(span) // pitch), bool)
+    folded[:len(span)] = span
+    folded = folded.reshape(-1, pitch).any(axis=0)
+    empty = np.concatenate([~folded, ~folded])
+    best, best_end, run = 0, 0, 0
+    for i, e in enumerate(empty):
+        run = run + 1 if e else 0
+        if run > best:
+            best, best_end = run, i + 1
+    return min(best, pitch - 1), best_end
+
+
+def fitpitch(span: np.ndarray, pitch: int) -> int:
+    # The autocorrelation peak is a plateau when sprites differ in size, so its
+    # first point can be a pixel or more off. The occupied runs are grouped into
+    # cells by that rough pitch and a line is fitted through the cells' centres;
+    # when the centres do not line up to within rounding, the better of the start
+    # and end fits is used (left- or right-aligned sprites). Of the two integers
+    # around the fitted repeat, the one that folds the cells into the narrower
+    # frame wins.
+    import numpy as np
+    edges = np.diff(np.concatenate(([0], span.astype(np.int8), [0])))
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    cell = np.rint((starts + ends - starts[0] - ends[0]) / (2 * pitch)).astype(np.int64)
+    k, first = np.unique(cell, return_index=True)
+    if len(k) < 2:
+        return pitch
+    lo = np.minimum.reduceat(starts, first)
+    hi = np.maximum.reduceat(ends, first)
+    fits = []
+    for y in ((lo + hi) / 2, lo, hi):
+        slope, icpt = np.polyfit(k, y, 1)
+        fits.append((float(np.abs(y - (icpt + slope * k)).max()), slope))
+    # integer centring leaves each centre up to half a pixel off the line
+    slope = fits[0][1] if fits[0][0] <= 0.5 + 1e-9 else min(fits[1:])[1]
+    candidates = {max(2, int(np.floor(slope))), max(2, int(np.ceil(slope)))}
+    return min(candidates, key=lambda p: (p - foldgap(span, p)[0], abs(p - slope)))
+
+
+def inferaxis(occ: np.ndarray) -> Optional[tuple]:
+    # (origin, frame, pad, count) along one axis of a region
+    import numpy as np
+    filled = np.nonzero(occ)[0]
+    if len(filled) == 0:
+        return None
+    first, last = int(filled[0]), int(filled[-1])
+    pitch = findpitch(occ[first:last + 1])
+    if pitch <= 1:
+        return (first, last - first + 1, 0, 1)
+    span = occ[first:last + 1]
+    pitch = fitpitch(span, pitch)
+    # the cells start right after the gutter
+    pad, best_end = foldgap(span, pitch)
+    phase = (first + best_end) % pitch if pad else first % pitch
+    origin = first - ((first - phase) % pitch)
+    count = (last - origin) // pitch + 1
+    return (origin, pitch - pad, pad, count)
+
+
+def infergrid(mask: np.ndarray) -> Optional[Dict[str, int]]:
+    cols = inferaxis(mask.any(axis=0))
+    rows = inferaxis(mask.any(axis=1))
+    if cols is None or rows is None:
+        return None
+    return {
+        'x': cols[0], 'frame_w': cols[1], 'pad_x': cols[2], 'cols': cols[3],
+        'y': rows[0], 'frame_h': rows[1], 'pad_y': rows[2], 'rows': rows[3],
+    }
+
+
+# Manifests
+
+def loadmanifest(path: Path) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as fh:
+        data = json.load(fh)
+    if not isinstance(data, dict) or not isinstance(data.get('zones', []), list):
+        raise ValueError(f"{path}: manifest must be an object with a 'zones' list")
+    return data
+
+
+def dumpjson(data: Dict[str, Any], listkey: str) -> str:
+    # one item of the long list per line keeps big files small and their diffs readable
+    parts = [f" {json.dumps(k)}: {json.dumps(v)}" for k, v in data.items() if k != listkey]
+    items = ',\n  '.join(json.dumps(z, separators=(',', ':')) for z in data.get(listkey, []))
+    parts.append(f' "{listkey}": [' + (f"\n  {items}\n " if items else '') + ']')
+    return '{\n' + ',\n'.join(parts) + '\n}\n'
+
+
+def writeatomic(path: Path, text: str):
+    tmp = Path(f"{path}.tmp")
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def saveproject(path: Path, data: Dict[str, Any]):
+    writeatomic(path, dumpjson(data, 'zones'))
+
+
+def sheetlayout(manifest: Dict[str, Any], sheet_path: Path) -> Dict[str, Any]:
+    # per-sheet entries (keyed by file name or stem) override the top-level layout
+    per_sheet = manifest.get('sheets', {})
+    override = per_sheet.get(sheet_path.name, per_sheet.get(sheet_path.stem, {}))
+    return {
+        'background': override.get('background', manifest.get('background')),
+        'zones': override.get('zones', manifest.get('zones', [])),
+    }
+
+
+def exportsheet(sheet_path: Path, layout: Dict[str, Any], out_dir: Path, sheet: Optional[str] = None,
+                workers: Optional[int] = None, cache: Optional[ExportCache] = None,
+                atlas: bool = False, dedup: bool = False, trim: bool = False,
+                profile: str = 'default', timings: Optional[Timings] = None,
+                pixels: Optional[PixelCache] = None, protect: List[Path] = ()) -> Path:
+    # `protect` lists inputs besides the sheet (the manifest) that outputs must not replace
+    sheet = sheet or sheet_path.stem
+    protect = [sheet_path, *protect]
+    bg = layout.get('background')
+    bg_rgb = parsebg(bg) if bg else None
+    zones = [(z['name'], zoneframes(z)) for z in layout['zones']]
+    timings = timings if timings is not None else Timings()
+    with timings.stage('load'):
+        img = loadsheet(sheet_path, pixels)
+    if atlas:
+        out_path = out_dir / f"{sheet}_atlas.png"
+        exportatlas(img, sheet, zones, out_path, bg_rgb, dedup=dedup, trim=trim, profile=profile,
+                    timings=timings, protect=protect)
+        return out_path
+    out_zip_path = out_dir / f"{sheet}.zip"
+    checktargets([out_zip_path], protect)
+    exportzip(img, sheet, zones, out_zip_path, bg_rgb, workers, cache, dedup, trim, profile, timings)
+    return out_zip_path
+
+
+# Watching
+
+def filestamp(path: Path) -> Optional[tuple]:
+    # (mtime, size) of a file, None while it is missing, e.g. halfway through an atomic save
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def watchfiles(paths: List[Path], on_change: Callable[[List[Path]], None], interval: float = 0.5,
+               settle: float = 0.5, stop: Optional[threading.Event] = None):
+    # Polls the stamps of `paths` until `stop` is set and calls on_change with the
+    # files that changed. A file has to keep the same stamp for `settle` seconds
+    # first, so a burst of saves (or one slow write) turns into a single call.
+    stop = stop or threading.Event()
+    seen = {p: filestamp(p) for p in paths}
+    changed: Dict[Path, float] = {}
+    while not stop.wait(interval):
+        now = time.monotonic()
+        for p in paths:
+            stamp = filestamp(p)
+            if stamp != seen[p]:
+                seen[p] = stamp
+                changed[p] = now
+        ready = [p for p, t in changed.items() if now - t >= settle and seen[p] is not None]
+        if ready:
+            for p in ready:
+                del changed[p]
+            on_change(ready)
+
+
+# Entrance
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="splitecore", description="Slice spritesheets into ZIPs or atlases without the GUI")
+    ap.add_argument('sheets', nargs='*', type=Path,
+                    help="sheet images to slice (default: the sheet saved in the manifest/project)")
+    ap.add_argument('-m', '--manifest', type=Path, required=True, help="JSON layout of zones or a saved project")
+    ap.add_argument('-o', '--out', type=Path, default=Path('.'), help="output folder for the ZIPs or atlases")
+    ap.add_argument('-n', '--name', help="export name (only with a single sheet, defaults to the file stem)")
+    ap.add_argument('-j', '--jobs', type=int, default=None, help="encoder threads (default: CPU count)")
+    ap.add_argument('--cache', type=Path, default=None, help="folder that keeps encoded frames between runs")
+    ap.add_argument('--atlas', action='store_true', help="pack all frames into one PNG plus a JSON descriptor")
+    ap.add_argument('--dedup', action='store_true', help="store identical frames once and record aliases")
+    ap.add_argument('--trim', action='store_true', help="crop transparent borders and record offsets")
+    ap.add_argument('--profile', choices=sorted(PROFILES), default='default',
+                    help="PNG/ZIP encoding: fast for iteration, small for release builds")
+    ap.add_argument('--timings', action='store_true', help="print where each export spent its time")
+    ap.add_argument('--report', type=Path, default=None, help="write per-stage timings of every sheet as JSON")
+    ap.add_argument('--cprofile', type=Path, default=None, help="write cProfile stats of the whole run")
+    ap.add_argument('--cache-days', type=float, default=30,
+                    help="drop cached frames unused for this many days (0 keeps them all)")
+    ap.add_argument('--pixel-cache', type=Path, default=None,
+                    help="folder that keeps decoded sheets to memory-map on later runs")
+    ap.add_argument('--watch', action='store_true',
+                    help="keep running and re-export a sheet whenever it or the manifest is saved")
+    ap.add_argument('--interval', type=float, default=0.5, help="seconds between checks in --watch mode")
+    args = ap.parse_args(argv)
+
+    if args.name and len(args.sheets) > 1:
+        ap.error("--name can only be used with a single sheet")
+    try:
+        manifest = loadmanifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Failed to read manifest: {e}", file=sys.stderr)
+        return 2
+    if not args.sheets:
+        if not manifest.get('sheet'):
+            ap.error("no sheets given and the manifest does not name one")
+        args.sheets = [args.manifest.parent / manifest['sheet']]
+        args.name = args.name or manifest.get('name') or None
+    args.out.mkdir(parents=True, exist_ok=True)
+    # in watch mode every sheet keeps its own in-memory cache (pruning is per
+    # export), so a re-export only encodes the frames whose pixels changed
+    shared = ExportCache(args.cache) if args.cache else None
+    caches = {p: shared or (ExportCache() if args.watch else None) for p in args.sheets}
+    pixels = PixelCache(args.pixel_cache) if args.pixel_cache else None
+
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    reports = []
+
+    def export(sheet_paths: List[Path]) -> int:
+        failed = 0
+        for sheet_path in sheet_paths:
+            timings = Timings()
+            try:
+                out = exportsheet(sheet_path, sheetlayout(manifest, sheet_path), args.out, args.name,
+                                  args.jobs, caches[sheet_path], args.atlas, args.dedup, args.trim,
+                                  args.profile, timings, pixels, [args.manifest])
+            except Exception as e:
+                print(f"{sheet_path}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            timings.finish()
+            size = out.stat().st_size
+            note = ''
+            if args.watch and 'cache_hits' in timings.counters:
+                encoded = timings.counters['files'] - timings.counters['cache_hits']
+                note = f", {encoded} of {timings.counters['files']} frames re-encoded"
+            print(f"{sheet_path} -> {out} ({humanbytes(size)} in {timings.wall:.2f}s{note})", flush=True)
+            if args.timings:
+                print(f"  {timings.summary()}", file=sys.stderr)
+            reports.append(dict({'sheet': str(sheet_path), 'out': str(out), 'size': size}, **timings.report()))
+        return failed
+
+    def changed(paths: List[Path]):
+        nonlocal manifest
+        if args.manifest in paths:
+            try:
+                manifest = loadmanifest(args.manifest)
+            except (OSError, ValueError) as e:
+                print(f"Failed to read manifest, keeping the previous one: {e}", file=sys.stderr)
+            else:
+                paths = args.sheets
+        export([p for p in args.sheets if p in paths])
+
+    failed = export(args.sheets)
+    if shared is not None and args.cache_days > 0:
+        shared.prunedir(args.cache_days)
+    if args.watch:
+        print(f"Watching {len(args.sheets)} sheet(s) and {args.manifest}, Ctrl+C to stop", file=sys.stderr)
+        try:
+            watchfiles(list(args.sheets) + [args.manifest], changed, args.interval, args.interval)
+        except KeyboardInterrupt:
+            pass
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if args.report:
+        writeatomic(args.report, dumpjson({'exports': reports}, 'exports'))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# Regression checks for grid inference on small sheets
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from splitecore import infergrid
+
+
+def gridmask(rows: int, cols: int, cell: int = 20, sprite: int = 14, margin: int = 5) -> np.ndarray:
+    # rows x cols cells of `cell` pixels, each holding a centered square sprite
+    off = (cell - sprite) // 2
+    mask = np.zeros((rows * cell + 2 * margin, cols * cell + 2 * margin), bool)
+    for r in range(rows):
+        for c in range(cols):
+            y, x = margin + r * cell + off, margin + c * cell + off
+            mask[y:y + sprite, x:x + sprite] = True
+    return mask
+
+
+@pytest.mark.parametrize('rows, cols', [(2, 2), (2, 8), (8, 2), (3, 3), (2, 3), (3, 2), (5, 7)])
+def test_counts_and_pitch(rows, cols):
+    grid = infergrid(gridmask(rows, cols))
+    assert (grid['rows'], grid['cols']) == (rows, cols)
+    assert grid['frame_w'] + grid['pad_x'] == 20
+    assert grid['frame_h'] + grid['pad_y'] == 20
+
+
+def variedmask(widths: list, heights: list, cell: int = 40, margin: int = 7, bottom: bool = False) -> np.ndarray:
+    # sprites of differing size, centred across each cell and centred or
+    # standing on a common baseline down it, like animation frames
+    mask = np.zeros((len(heights) * cell + 2 * margin, len(widths) * cell + 2 * margin), bool)
+    for r, h in enumerate(heights):
+        for c, w in enumerate(widths):
+            x = margin + c * cell + (cell - w) // 2
+            y = margin + r * cell + (cell - 2 - h if bottom else (cell - h) // 2)
+            mask[y:y + h, x:x + w] = True
+    return mask
+
+
+def test_varied_sprite_sizes():
+    grid = infergrid(variedmask([20, 24, 22, 26, 21], [30]))
+    assert grid['cols'] == 5
+    assert grid['frame_w'] + grid['pad_x'] == 40
+
+
+@pytest.mark.parametrize('widths, heights', [
+    ([20, 24, 22, 26, 21, 23], [24, 19, 27, 21]),
+    ([18, 14, 21, 16, 19, 15], [30, 26, 31, 25]),
+    ([30, 27, 33, 29, 31, 26], [16, 20, 15, 19]),
+])
+@pytest.mark.parametrize('bottom', [False, True])
+def test_jittered_sprite_sizes(widths, heights, bottom):
+    grid = infergrid(variedmask(widths, heights, bottom=bottom))
+    assert (grid['rows'], grid['cols']) == (4, 6)
+    assert grid['frame_w'] + grid['pad_x'] == 40
+    assert grid['frame_h'] + grid['pad_y'] == 40
+
+
+def test_single_row():
+    grid = infergrid(gridmask(1, 5))
+    assert (grid['rows'], grid['cols']) == (1, 5)
+    assert grid['frame_h'] == 14